@@ -1,9 +1,10 @@
 """
 Admin configuration for Supermart models
 """
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Category, Product, Cart, CartItem, Order, OrderItem, ChatMessage, StockEntry
+from .models import User, Category, Product, Cart, CartItem, Order, OrderItem, ChatMessage, StockEntry, Job, PaymentEvent, OrderStatusChange
+from .utils.order_states import ACTIONS, ConcurrentUpdate, bulk_transition
 
 
 @admin.register(User)
@@ -43,12 +44,27 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'subtotal', 'added_at']
 
 
+def _transition_action(name, target):
+    """Admin action moving the selected orders to `target` through bulk_transition"""
+    def action(modeladmin, request, queryset):
+        try:
+            moved = bulk_transition(queryset, target, request.user, note=f"Admin {name}")
+        except ConcurrentUpdate as exc:
+            modeladmin.message_user(request, str(exc), messages.ERROR)
+        else:
+            modeladmin.message_user(request, f"{moved} orders moved to {target.lower()}.")
+    action.__name__ = f'{name}_orders'
+    return admin.action(description=f'Move selected orders to {target.lower()}')(action)
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_id', 'user', 'total_amount', 'payment_status', 'order_status', 'created_at']
     list_filter = ['payment_status', 'order_status', 'created_at']
     search_fields = ['order_id', 'user__username']
-    readonly_fields = ['created_at', 'updated_at']
+    # Status changes go through the actions, which validate and audit them
+    readonly_fields = ['order_status', 'created_at', 'updated_at']
+    actions = [_transition_action(name, target) for name, target in ACTIONS.items()]
 
 
 @admin.register(OrderItem)
@@ -69,3 +85,26 @@ class StockEntryAdmin(admin.ModelAdmin):
     list_filter = ['entry_type', 'created_at']
     search_fields = ['product__name']
     readonly_fields = ['created_at']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'run_after', 'locked_by', 'updated_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['created_at', 'updated_at', 'last_error']
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ['razorpay_payment_id', 'razorpay_order_id', 'status', 'source', 'received_at', 'processed_at']
+    list_filter = ['status', 'source']
+    search_fields = ['razorpay_payment_id', 'razorpay_order_id']
+    readonly_fields = ['received_at', 'processed_at']
+
+
+@admin.register(OrderStatusChange)
+class OrderStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ['order', 'from_status', 'to_status', 'changed_by', 'note', 'created_at']
+    list_filter = ['to_status', 'created_at']
+    search_fields = ['order__order_id']
+    readonly_fields = ['created_at']
@@ -0,0 +1,136 @@
+"""
+Async versions of the catalog and chatbot views for the ASGI app.
+
+Enabled with ASYNC_VIEWS=True (see core/urls.py). Data is loaded with
+the async ORM; only template rendering, which is CPU-bound and may touch
+the session, is handed to a worker thread.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Product, Category
+from .utils import catalog
+from .utils.conditional import catalog_cache_control, conditional_response, page_etag, set_validators
+from .utils.stock_events import broker
+from .views import _catalog_products, _chatbot_reply, _chatbot_wants_categories
+
+arender = sync_to_async(render)
+apage_etag = sync_to_async(page_etag)
+
+
+@catalog_cache_control
+async def products_list(request):
+    products = _catalog_products(request)
+
+    state = await products.aaggregate(last_modified=Max("updated_at"), count=Count("id"))
+    etag = await apage_etag(request, request.get_full_path(), state["last_modified"], state["count"])
+    # ETag only, as in views.products_list
+    not_modified = conditional_response(request, etag, None)
+    if not_modified is not None:
+        return not_modified
+
+    products = [product async for product in products.select_related("category")]
+    categories = await sync_to_async(catalog.categories)()
+
+    response = await arender(request, "products.html", {
+        "products": products,
+        "categories": categories,
+    })
+    return set_validators(response, etag, None)
+
+
+@catalog_cache_control
+async def product_detail(request, pk):
+    updated_at = await Product.objects.filter(pk=pk).values_list("updated_at", flat=True).afirst()
+    if updated_at is None:
+        raise Http404("No Product matches the given query.")
+
+    etag = await apage_etag(request, "product", pk, updated_at)
+    not_modified = conditional_response(request, etag, updated_at)
+    if not_modified is not None:
+        return not_modified
+
+    product = await Product.objects.select_related("category").aget(pk=pk)
+    response = await arender(request, "product_detail.html", {"product": product})
+    return set_validators(response, etag, updated_at)
+
+
+@csrf_exempt
+async def chatbot_api(request):
+    if request.method == "POST":
+        data = json.loads(request.body)
+        message = data.get("message", "").lower()
+
+        category_names = []
+        if _chatbot_wants_categories(message):
+            category_names = [name async for name in Category.objects.values_list("name", flat=True)]
+
+        return JsonResponse({"response": _chatbot_reply(message, category_names)})
+
+    return JsonResponse({"error": "Invalid request"}, status=400)
+
+
+STREAM_KEEPALIVE_SECONDS = 15
+# Clients reconnect automatically; bounding each stream frees idle connections
+STREAM_MAX_SECONDS = 300
+STREAM_RETRY_MS = 3000
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stock_stream(request):
+    """
+    Server-sent events with live stock levels.
+
+    ?products=1,2,3 limits the stream to those products; without it every
+    change is sent. The first event is a snapshot of current levels.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "The stock stream is only served by the ASGI app"}, status=501)
+
+    try:
+        product_ids = [int(pk) for pk in request.GET.get("products", "").split(",") if pk]
+    except ValueError:
+        return JsonResponse({"error": "'products' must be a comma-separated list of integers"}, status=400)
+
+    snapshot = Product.objects.values("id", "quantity", "low_stock_threshold")
+    if product_ids:
+        snapshot = snapshot.filter(pk__in=product_ids)
+
+    async def events():
+        # Subscribe before reading the snapshot so no change falls in between;
+        # the ASGI handler cancels this generator when the client disconnects
+        subscription = broker.subscribe(product_ids)
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            levels = [
+                {"product": row["id"], "quantity": row["quantity"],
+                 "low_stock": row["quantity"] <= row["low_stock_threshold"]}
+                async for row in snapshot
+            ]
+            yield _sse("snapshot", levels)
+            while time.monotonic() < deadline:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse("stock", event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,39 @@
+"""
+Authentication backend for email logins
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+
+def users_by_email(email):
+    """
+    Users whose email matches case-insensitively.
+
+    Compares LOWER(email) so the functional unique index serves the lookup,
+    which email__iexact (LIKE or UPPER() depending on the backend) cannot.
+    Users without an email store NULL, which never matches.
+    """
+    return (
+        get_user_model().objects
+        .alias(email_lower=Lower('email'))
+        .filter(email_lower=email.lower())
+    )
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with email and password in a single indexed query"""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        UserModel = get_user_model()
+        try:
+            user = users_by_email(email).get()
+        except UserModel.DoesNotExist:
+            # Run the hasher anyway so a missing account takes as long as a wrong password
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,177 @@
+"""
+Cross-process cache backend stored in a local SQLite file.
+
+A stand-in for Redis on single-host deployments: every worker process
+opens the same file, so cached data and generation counters are shared.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# SQLite limits the number of bound parameters per statement
+_CHUNK = 500
+
+
+class SQLiteCache(BaseCache):
+    """Cache backend keeping entries in a WAL-mode SQLite database file"""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _live(self, expires, now):
+        return expires is None or expires > now
+
+    def _maybe_cull(self, conn):
+        if self._max_entries <= 0 or random.random() > 0.01:
+            return
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                conn.execute('DELETE FROM cache')
+            else:
+                conn.execute(
+                    'DELETE FROM cache WHERE rowid IN '
+                    '(SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                    (count // self._cull_frequency,),
+                )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, time.time()))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, self._dumps(value), self.get_backend_timeout(timeout)),
+            )
+            return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or not self._live(row[1], time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, self._dumps(value), self.get_backend_timeout(timeout)),
+            )
+            self._maybe_cull(conn)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            cursor = conn.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            return conn.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and self._live(row[0], time.time())
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            row = conn.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None or not self._live(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            conn.execute('UPDATE cache SET value = ? WHERE key = ?', (self._dumps(value), key))
+        return value
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        conn = self._connection()
+        now = time.time()
+        found = {}
+        made = list(key_map)
+        for start in range(0, len(made), _CHUNK):
+            chunk = made[start:start + _CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT key, value, expires FROM cache WHERE key IN ({placeholders})', chunk
+            )
+            for key, value, expires in rows:
+                if self._live(expires, now):
+                    found[key_map[key]] = pickle.loads(value)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._dumps(value), expires)
+            for key, value in data.items()
+        ]
+        with self._write() as conn:
+            conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', rows)
+            self._maybe_cull(conn)
+        return []
+
+    def delete_many(self, keys, version=None):
+        made = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        with self._write() as conn:
+            conn.executemany('DELETE FROM cache WHERE key = ?', made)
+
+    def clear(self):
+        with self._write() as conn:
+            conn.execute('DELETE FROM cache')
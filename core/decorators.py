@@ -1,21 +1,88 @@
 """
 Role-based access control decorators
+
+Each role decorator records which roles may open the view; the records are
+compiled into a frozen role -> view names table on first use. The user's
+role is kept in the session next to a per-user generation; when the cache
+holding the generations is shared by every worker, the check needs neither
+the user row nor the database unless the role went stale.
 """
-from django.shortcuts import redirect
+from functools import cache, wraps
+from types import MappingProxyType
+
+from django.conf import settings
 from django.contrib import messages
-from functools import wraps
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+
+from .routers import replica_reads
+from .utils.generations import get_generation
+
+ROLE_SESSION_KEY = '_role'
+
+# module-qualified view name -> roles allowed, filled in as views are decorated
+_view_roles = {}
+
+
+def role_generation(user_id):
+    """Generation name bumped whenever the user's account changes"""
+    return f'role:{user_id}'
+
+
+@cache
+def role_permissions():
+    """Frozen role -> allowed view names table"""
+    table = {}
+    for view_name, roles in _view_roles.items():
+        for role in roles:
+            table.setdefault(role, set()).add(view_name)
+    return MappingProxyType({role: frozenset(views) for role, views in table.items()})
+
+
+def remember_role(request, user):
+    """Store the user's role in the session, stamped with its generation"""
+    request.session[ROLE_SESSION_KEY] = [user.role, get_generation(role_generation(user.pk))]
+
+
+def session_role(request):
+    """
+    The logged-in user's role, or None for anonymous visitors.
+
+    Read from the session while its generation is current, but only when
+    the generations live in a shared cache: a per-process cache would keep
+    honouring a role another worker has revoked. Otherwise the user is
+    loaded (which also checks the session's auth hash) and the session is
+    updated if the role moved.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    stored = request.session.get(ROLE_SESSION_KEY)
+    if settings.CACHE_SHARED and stored and stored[1] == get_generation(role_generation(user_id)):
+        return stored[0]
+    if not request.user.is_authenticated:
+        return None
+    if not stored or stored[0] != request.user.role:
+        remember_role(request, request.user)
+    return request.user.role
 
 
 def role_required(allowed_roles=[]):
     """Decorator to restrict access based on user role"""
     def decorator(view_func):
+        view_name = f'{view_func.__module__}.{view_func.__qualname__}'
+        _view_roles[view_name] = frozenset(allowed_roles)
+        role_permissions.cache_clear()
+
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            if not request.user.is_authenticated:
+            role = session_role(request)
+            if role is None:
                 messages.error(request, 'Please login to access this page.')
-                return redirect('login')
+                return redirect_to_login(request.get_full_path())
             
-            if request.user.role not in allowed_roles:
+            if view_name not in role_permissions().get(role, ()):
                 messages.error(request, 'You do not have permission to access this page.')
                 return redirect('home')
             
@@ -42,3 +109,13 @@ def staff_required(view_func):
 def customer_required(view_func):
     """Decorator for customer views"""
     return role_required(['CUSTOMER'])(view_func)
+
+
+def read_replica(view_func):
+    """Decorator for read-only reporting views that can use the replica"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
@@ -3,6 +3,7 @@ Forms for Supermart application
 """
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from .backends import users_by_email
 from .models import User, Product, Category, StockEntry
 
 
@@ -28,7 +29,7 @@ class UserRegistrationForm(UserCreationForm):
         email = self.cleaned_data.get('email', '').lower()
         
         # Check if email already exists
-        if User.objects.filter(email__iexact=email).exists():
+        if users_by_email(email).exists():
             raise forms.ValidationError("This email is already registered.")
         
         # Check if trying to register with @supermart.com domain
@@ -79,6 +80,14 @@ class ProductForm(forms.ModelForm):
         }
 
 
+class ProductBulkUpdateForm(forms.Form):
+    """CSV upload of sku,price,low_stock_threshold,supplier rows"""
+    csv_file = forms.FileField(
+        label='CSV file',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+
+
 class CategoryForm(forms.ModelForm):
     """Category Form"""
     class Meta:
@@ -0,0 +1,137 @@
+"""
+Background jobs queued after checkout, and periodic housekeeping
+
+Handlers run in the run_jobs worker, at least once: a job that fails is
+retried, so each handler must be safe to repeat.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import User, Product, Order, OrderItem, PaymentEvent
+from .utils import cart_store, catalog
+from .utils.jobs import enqueue_many, enqueue_unique, handler, periodic
+from .utils.payment_gateway import get_gateway
+from .utils.payments import PAID_STATUSES, SETTLED_STATUSES, ingest, process_inbox
+from .utils.valuation import inventory_valuation
+
+logger = logging.getLogger(__name__)
+
+ORDER_JOBS = (
+    'order.rollups',
+    'order.low_stock',
+    'order.notify',
+    'order.reconcile_payment',
+)
+
+
+def enqueue_order_jobs(order):
+    """Queue the post-checkout work for an order; call inside its transaction"""
+    return enqueue_many([(kind, {'order_id': order.pk}) for kind in ORDER_JOBS])
+
+
+@handler('order.rollups')
+def update_rollups(payload):
+    """Recompute dashboard KPIs and the valuation report ahead of the next dashboard load"""
+    catalog.refresh_kpis()
+    inventory_valuation()
+
+
+@handler('order.low_stock')
+def evaluate_low_stock(payload):
+    """Alert staff about products in the order that are now at or below their threshold"""
+    ordered = OrderItem.objects.filter(order_id=payload['order_id']).values('product_id')
+    low_stock = list(Product.objects.filter(
+        pk__in=ordered, quantity__lte=F('low_stock_threshold')
+    ).order_by('quantity'))
+    if not low_stock:
+        return
+
+    lines = [f"{p.name} ({p.sku}): {p.quantity} left, threshold {p.low_stock_threshold}" for p in low_stock]
+    logger.warning("Low stock after order %s: %s", payload['order_id'], "; ".join(lines))
+
+    recipients = list(User.objects.filter(
+        role__in=['STAFF', 'MANAGER'], is_active=True
+    ).filter(email__isnull=False).values_list('email', flat=True))
+    if recipients:
+        send_mail("Low stock alert", "\n".join(lines), None, recipients)
+
+
+@handler('order.notify')
+def send_order_confirmation(payload):
+    """Email the customer a summary of their order"""
+    order = Order.objects.select_related('user').prefetch_related('items__product').get(pk=payload['order_id'])
+    if not order.user.email:
+        return
+
+    lines = [f"{item.product.name} x {item.quantity}: ₹{item.subtotal}" for item in order.items.all()]
+    lines += ["", f"Total: ₹{order.total_amount}", f"Shipping to: {order.shipping_address}"]
+    send_mail(f"Your Supermart order {order.order_id}", "\n".join(lines), None, [order.user.email])
+
+
+@handler('order.reconcile_payment')
+def reconcile_payment(payload):
+    """
+    Settle an unpaid order from the gateway's record of its payments.
+
+    Raises while the payment is still pending so the job is retried later.
+    """
+    order = Order.objects.get(pk=payload['order_id'])
+    if order.payment_status == 'SUCCESS' or not order.razorpay_order_id:
+        return
+    gateway = get_gateway()
+    if gateway is None:
+        logger.info("No payment gateway configured; leaving order %s unreconciled", order.order_id)
+        return
+
+    payments = gateway.order_payments(order.razorpay_order_id)
+    # Settled attempts go through the same inbox as callbacks and webhooks
+    ingest([
+        PaymentEvent(
+            razorpay_payment_id=payment['id'],
+            razorpay_order_id=order.razorpay_order_id,
+            status=payment['status'],
+            source='RECONCILE',
+            payload=payment,
+        )
+        for payment in payments if payment.get('status') in SETTLED_STATUSES
+    ])
+    if not any(payment.get('status') in PAID_STATUSES for payment in payments) and \
+            not (payments and all(payment.get('status') == 'failed' for payment in payments)):
+        raise RuntimeError(f"Payment for order {order.order_id} is still pending")
+
+
+@handler('payments.process')
+def process_payments(payload):
+    """Apply queued payment callbacks to orders until the inbox is empty"""
+    while process_inbox():
+        pass
+
+
+# Each job runs in one transaction; a larger backlog continues in another job
+SWEEP_BATCHES_PER_JOB = 10
+
+
+@periodic('carts.sweep', every=timedelta(days=1))
+def sweep_idle_carts(payload):
+    """Delete stored carts idle for CART_IDLE_DAYS"""
+    if 'cutoff' in payload:
+        cutoff = parse_datetime(payload['cutoff'])
+    else:
+        cutoff = timezone.now() - timedelta(days=settings.CART_IDLE_DAYS)
+
+    total = 0
+    for _ in range(SWEEP_BATCHES_PER_JOB):
+        carts, _ = cart_store.delete_idle_carts(cutoff, cart_store.SWEEP_BATCH_SIZE)
+        total += carts
+        if carts < cart_store.SWEEP_BATCH_SIZE:
+            break
+    else:
+        enqueue_unique('carts.sweep', {'cutoff': cutoff.isoformat()})
+    logger.info("Swept %s carts idle since %s", total, cutoff)
+
@@ -0,0 +1,135 @@
+"""
+Management command comparing concurrent throughput of the sync (WSGI) and async (ASGI) views
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from core.models import Product
+from core.utils.benchmark import summarize
+
+ROUTES = ['products_list', 'product_detail', 'chatbot_api']
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive products_list, product_detail and chatbot_api concurrently through the '
+        'WSGI handler with the sync views and through the ASGI handler with the async '
+        'views, and compare throughput. Each side runs in its own process so that '
+        'ASYNC_VIEWS is configured exactly as in deployment.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per route and side (default: 200)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Concurrent in-flight requests (default: 20)'
+        )
+        parser.add_argument(
+            '--phase',
+            choices=['wsgi', 'asgi'],
+            default=None,
+            help='Run only one side in this process and print JSON (used internally)'
+        )
+
+    def handle(self, *args, **options):
+        if options['phase']:
+            results = self._run_phase(options['phase'], options['requests'], options['concurrency'])
+            self.stdout.write(json.dumps(results))
+            return
+
+        sides = {}
+        for phase, async_views in (('wsgi', 'False'), ('asgi', 'True')):
+            self.stdout.write(f'Running {phase.upper()} side...')
+            sides[phase] = self._spawn(phase, async_views, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{options['requests']} requests per route, concurrency {options['concurrency']}\n"
+        ))
+        self.stdout.write(f"{'route':<18}{'wsgi p95':>10}{'asgi p95':>10}{'wsgi req/s':>12}{'asgi req/s':>12}{'ratio':>8}")
+        for route in ROUTES:
+            wsgi, asgi = sides['wsgi'][route], sides['asgi'][route]
+            ratio = asgi['rps'] / wsgi['rps'] if wsgi['rps'] else 0
+            self.stdout.write(
+                f"{route:<18}{wsgi['p95']:>10.2f}{asgi['p95']:>10.2f}"
+                f"{wsgi['rps']:>12.1f}{asgi['rps']:>12.1f}{ratio:>7.2f}x"
+            )
+
+    def _spawn(self, phase, async_views, options):
+        env = dict(os.environ, ASYNC_VIEWS=async_views, PAGE_CACHE_ENABLED='False')
+        command = [
+            sys.executable, '-m', 'django', 'benchmark_asgi',
+            '--phase', phase,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+        ]
+        completed = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise CommandError(f'{phase} phase failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def _requests(self, count):
+        product_pk = Product.objects.filter(quantity__gt=0).values_list('pk', flat=True).first()
+        if product_pk is None:
+            raise CommandError('No products in stock; seed the database with populate_sample_data first')
+        chatbot = json.dumps({'message': 'which category do you have'})
+        plans = {
+            'products_list': ('get', reverse('products_list'), None, {}),
+            'product_detail': ('get', reverse('product_detail', kwargs={'pk': product_pk}), None, {}),
+            'chatbot_api': ('post', reverse('chatbot_api'), chatbot, {'content_type': 'application/json'}),
+        }
+        return {route: [plans[route]] * count for route in ROUTES}
+
+    def _run_phase(self, phase, count, concurrency):
+        results = {}
+        for route, plans in self._requests(count).items():
+            if phase == 'wsgi':
+                latencies, wall = self._run_wsgi(plans, concurrency)
+            else:
+                latencies, wall = asyncio.run(self._run_asgi(plans, concurrency))
+            results[route] = summarize(latencies, wall)
+        return results
+
+    def _run_wsgi(self, plans, concurrency):
+        def one(plan):
+            method, url, data, extra = plan
+            client = Client()
+            start = time.perf_counter()
+            getattr(client, method)(url, data, **extra)
+            return (time.perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(one, plans))
+            return latencies, time.perf_counter() - start
+
+    async def _run_asgi(self, plans, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(plan):
+            method, url, data, extra = plan
+            async with semaphore:
+                client = AsyncClient()
+                start = time.perf_counter()
+                await getattr(client, method)(url, data, **extra)
+                return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(plan) for plan in plans))
+        return list(latencies), time.perf_counter() - start
@@ -0,0 +1,104 @@
+"""
+Management command to compare the old and new login lookups on a large user table
+"""
+import random
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.backends import users_by_email
+from core.models import User
+from core.utils.benchmark import summarize, timed
+
+BENCH_PASSWORD = 'bench-pass-123'
+EMAIL_DOMAIN = 'login-bench.example.com'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large synthetic user table inside a rolled-back transaction and time '
+        'logins the old way (email__iexact lookup, then authenticate by username) '
+        'against the email backend (one LOWER(email) index lookup)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1_000_000,
+            help='Synthetic users to seed (default: 1000000)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Logins timed per mode; each runs the password hasher (default: 20)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Users inserted per statement while seeding (default: 10000)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._seed(options['users'], options['batch_size'])
+            # Mixed case, as people type it
+            emails = [
+                self._email(random.randrange(options['users'])).upper()
+                for _ in range(options['requests'])
+            ]
+            results = {
+                'lookup before': self._measure(emails, self._lookup_before),
+                'lookup after': self._measure(emails, self._lookup_after),
+                'login before': self._measure(emails, self._login_before),
+                'login after': self._measure(emails, self._login_after),
+            }
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"\n{'mode':<16}{'p50':>10}{'p95':>10}{'mean':>10}")
+        for label, summary in results.items():
+            self.stdout.write(
+                f"{label:<16}{summary['p50']:>8.2f}ms{summary['p95']:>8.2f}ms{summary['mean']:>8.2f}ms"
+            )
+        saved = results['login before']['mean'] - results['login after']['mean']
+        self.stdout.write(self.style.SUCCESS(f'\nSaved per login: {saved:.2f}ms (mean)'))
+
+    def _email(self, n):
+        return f'user{n}@{EMAIL_DOMAIN}'
+
+    def _seed(self, count, batch_size):
+        # One hash for everyone; bulk_create skips User.save, so set the role here
+        password = make_password(BENCH_PASSWORD)
+        self.stdout.write(f'Seeding {count} users on {connection.vendor}...')
+        for start in range(0, count, batch_size):
+            User.objects.bulk_create([
+                User(username=f'login_bench_{n}', email=self._email(n), password=password, role='CUSTOMER')
+                for n in range(start, min(start + batch_size, count))
+            ])
+
+    def _measure(self, emails, func):
+        latencies = []
+        for email in emails:
+            user, elapsed = timed(func, email)
+            if user is None:
+                raise RuntimeError(f'Login failed for {email}')
+            latencies.append(elapsed)
+        return summarize(latencies)
+
+    def _lookup_before(self, email):
+        user = User.objects.get(email__iexact=email)
+        return User.objects.get(username=user.username)
+
+    def _lookup_after(self, email):
+        return users_by_email(email).get()
+
+    def _login_before(self, email):
+        user = User.objects.get(email__iexact=email)
+        return authenticate(username=user.username, password=BENCH_PASSWORD)
+
+    def _login_after(self, email):
+        return authenticate(email=email, password=BENCH_PASSWORD)
@@ -0,0 +1,66 @@
+"""
+Management command to compare template load and render time with and without the cached loader
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from django.test import RequestFactory
+
+from core.utils.benchmark import summarize, timed
+from core.utils.templates import django_engine, precompile_templates, template_names
+
+
+class Command(BaseCommand):
+    help = (
+        'Time loading and rendering every template with a non-caching loader '
+        '(before) and with the precompiled cached loader (after)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Load+render cycles per template (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        cached_engine = django_engine()
+        uncached_engine = Engine(
+            loaders=['django.template.loaders.app_directories.Loader'],
+            libraries=cached_engine.libraries,
+        )
+
+        compile_times = precompile_templates(cached_engine)
+        self.stdout.write(self.style.SUCCESS(
+            f'Precompiled {len(compile_times)} templates in {sum(compile_times.values()):.1f}ms\n'
+        ))
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        def cycle(engine, name):
+            template = engine.get_template(name)
+            return template.render(Context({'request': request, 'user': request.user}))
+
+        self.stdout.write(f"{'template':<40}{'before p50':>12}{'after p50':>12}{'speedup':>10}")
+        total_before = total_after = 0.0
+        for name in template_names():
+            try:
+                before = [timed(cycle, uncached_engine, name)[1] for _ in range(iterations)]
+                after = [timed(cycle, cached_engine, name)[1] for _ in range(iterations)]
+            except Exception as exc:
+                self.stdout.write(self.style.WARNING(f'{name:<40}  skipped: {exc.__class__.__name__}'))
+                continue
+
+            before_p50 = summarize(before)['p50']
+            after_p50 = summarize(after)['p50']
+            total_before += before_p50
+            total_after += after_p50
+            speedup = before_p50 / after_p50 if after_p50 else 0
+            self.stdout.write(f'{name:<40}{before_p50:>10.3f}ms{after_p50:>10.3f}ms{speedup:>9.1f}x')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSum of p50s: {total_before:.2f}ms uncached vs {total_after:.2f}ms cached'
+        ))
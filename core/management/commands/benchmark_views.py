@@ -0,0 +1,380 @@
+"""
+Management command to load-test every core view against the configured database
+"""
+import json
+import secrets
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.urls import reverse
+
+from core import urls as core_urls
+from core.models import User, Product, Order
+from core.utils.benchmark import compare, load_baseline, save_baseline, summarize
+from core.utils.cart_store import SESSION_KEY
+from core.utils.payments import sign
+
+# Roles of the throwaway users driving role-protected views. They get unique
+# example.com addresses and a random password, and are deleted after the run.
+BENCH_ROLES = ('ADMIN', 'MANAGER', 'STAFF', 'CUSTOMER')
+
+
+def _cart_session(ctx):
+    return {SESSION_KEY: {str(ctx['product_pk']): 1}}
+
+
+def _cart_product(ctx):
+    return {'pk': ctx['product_pk']}
+
+
+def _with_order(ctx):
+    order = Order.objects.create(
+        order_id=f'BENCH{uuid.uuid4().hex[:8].upper()}', user=ctx['users']['CUSTOMER'],
+        total_amount=100, shipping_address='1 Bench Street', razorpay_order_id=f'order_{uuid.uuid4().hex[:14]}',
+    )
+    return {'order_id': order.order_id}
+
+
+def _with_confirmed_orders(ctx, count=500):
+    Order.objects.bulk_create([
+        Order(
+            order_id=f'BENCH{uuid.uuid4().hex[:10].upper()}', user=ctx['users']['CUSTOMER'],
+            total_amount=100, shipping_address='1 Bench Street', order_status='CONFIRMED',
+        )
+        for _ in range(count)
+    ])
+
+
+def _signed_callback(ctx):
+    # Verified only when RAZORPAY_KEY_SECRET is set; otherwise this times the rejection
+    payment_id, order_id = f'pay_{uuid.uuid4().hex[:14]}', f'order_{uuid.uuid4().hex[:14]}'
+    return {
+        'razorpay_payment_id': payment_id,
+        'razorpay_order_id': order_id,
+        'razorpay_signature': sign(f'{order_id}|{payment_id}', settings.RAZORPAY_KEY_SECRET or 'unset'),
+    }
+
+
+# url name -> scenario. `role` selects the logged-in client (None = anonymous).
+# `expect` is the status (or statuses) a working route answers with, 200 by
+# default; any other status means the timings measure something else, e.g. a
+# login redirect.
+# `setup` and `kwargs` run inside the per-request transaction before the timed
+# call; `kwargs` returns the URL arguments and `session` values to store in the
+# client's session, which lives on in the cache after the rollback.
+SCENARIOS = {
+    'home': {'role': None},
+    'register': {'role': None},
+    'login': {
+        'role': None, 'method': 'post', 'fresh_client': True, 'expect': 302,
+        'data': lambda ctx: {'email': ctx['users']['CUSTOMER'].email, 'password': ctx['password']},
+    },
+    'logout': {'role': None, 'expect': 302},
+    'products_list': {'role': None},
+    'products_search': {'url_name': 'products_list', 'role': None, 'query': {'search': 'a'}},
+    'product_detail': {'role': None, 'kwargs': lambda ctx: {'pk': ctx['product_pk']}},
+    'cart_view': {'role': 'CUSTOMER', 'session': _cart_session},
+    'add_to_cart': {'role': 'CUSTOMER', 'kwargs': lambda ctx: {'pk': ctx['product_pk']}, 'expect': 302},
+    'add_to_cart_anonymous': {
+        'url_name': 'add_to_cart', 'role': None, 'kwargs': lambda ctx: {'pk': ctx['product_pk']},
+        'expect': 302,
+    },
+    'update_cart_item': {
+        'role': 'CUSTOMER', 'method': 'post', 'session': _cart_session, 'kwargs': _cart_product,
+        'data': lambda ctx: {'quantity': 1}, 'expect': 302,
+    },
+    'remove_from_cart': {'role': 'CUSTOMER', 'session': _cart_session, 'kwargs': _cart_product, 'expect': 302},
+    'checkout': {
+        'role': 'CUSTOMER', 'method': 'post', 'session': _cart_session, 'expect': 302,
+        'data': lambda ctx: {'shipping_address': '1 Bench Street', 'phone': '9999999999'},
+    },
+    'customer_dashboard': {'role': 'CUSTOMER'},
+    'staff_dashboard': {'role': 'STAFF'},
+    'manager_dashboard': {'role': 'MANAGER'},
+    'admin_dashboard': {'role': 'ADMIN'},
+    'order_history': {'role': 'CUSTOMER'},
+    'customer_profile': {'role': 'CUSTOMER'},
+    'stock_entry_view': {'role': 'STAFF'},
+    'performance_stats': {'role': 'STAFF'},
+    'staff_orders': {'role': 'STAFF'},
+    'staff_orders_bulk': {
+        'url_name': 'staff_orders', 'role': 'STAFF', 'method': 'post', 'setup': _with_confirmed_orders,
+        'data': lambda ctx: {'action': 'process', 'scope': 'all'}, 'expect': 302,
+    },
+    'manager_inventory': {'role': 'MANAGER'},
+    'manager_approvals': {'role': 'MANAGER'},
+    'manager_valuation': {'role': 'MANAGER'},
+    'manager_valuation_export': {'role': 'MANAGER'},
+    'manager_bulk_update': {'role': 'MANAGER'},
+    'user_management': {'role': 'ADMIN'},
+    'inventory_dashboard': {'role': 'ADMIN'},
+    'purchase_reports': {'role': 'ADMIN'},
+    'analytics': {'role': 'ADMIN'},
+    'api_products': {'role': None, 'query': {'fields': 'id,name,price,quantity', 'limit': 100}},
+    'api_product_detail': {'role': None, 'kwargs': lambda ctx: {'pk': ctx['product_pk']}},
+    'api_categories': {'role': None},
+    'api_stock': {'role': None, 'query': {'low': 1}},
+    # Long-lived on ASGI; the WSGI test client only exercises the 501 guard
+    'stock_stream': {'role': None, 'query': {'products': '1,2,3'}, 'expect': 501},
+    'chatbot_api': {
+        'role': None, 'method': 'post', 'json': True,
+        'data': lambda ctx: {'message': 'which category do you have'},
+    },
+    'payment_callback': {
+        'role': None, 'method': 'post', 'json': True, 'data': _signed_callback, 'expect': (200, 400),
+    },
+    # Unsigned, so this times signature rejection
+    'payment_webhook': {
+        'role': None, 'method': 'post', 'json': True, 'data': lambda ctx: {'event': 'payment.captured'},
+        'expect': 400,
+    },
+    'payment_success': {'role': 'CUSTOMER', 'kwargs': _with_order},
+    'payment_failure': {'role': None},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every route in core/urls.py with the Django test client and report '
+        'p50/p95/p99 latency, queries per request and throughput. Each request runs in '
+        'a rolled-back transaction and the benchmark users are deleted afterwards, so '
+        'the seeded database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Requests per route (default: 50)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Concurrent client threads (default: 1; SQLite serializes writers)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Untimed warm-up requests per route (default: 3)'
+        )
+        parser.add_argument(
+            '--only',
+            default=None,
+            help='Comma-separated scenario names or glob patterns to run'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=None,
+            help='Baseline JSON to compare against'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            default=None,
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed p95 growth over the baseline (default: 0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when a regression is detected'
+        )
+
+    def handle(self, *args, **options):
+        ctx = self._context()
+        try:
+            self._benchmark(ctx, options)
+        finally:
+            self._cleanup(ctx)
+
+    def _benchmark(self, ctx, options):
+        scenarios = self._select(options['only'])
+
+        uncovered = self._uncovered_routes()
+        if uncovered:
+            self.stdout.write(self.style.WARNING(f"⚠ Routes without a scenario: {', '.join(uncovered)}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmarking {len(scenarios)} routes: {options['requests']} requests each, "
+            f"concurrency {options['concurrency']}\n"
+        ))
+        self.stdout.write(f"{'route':<28}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'req/s':>9}  status")
+
+        results = {}
+        unexpected = []
+        for name, scenario in scenarios.items():
+            result = self._run(name, scenario, ctx, options)
+            statuses = ','.join(f'{code}x{n}' for code, n in sorted(result['statuses'].items()))
+            line = (
+                f"{name:<28}{result['p50']:>9.2f}{result['p95']:>9.2f}{result['p99']:>9.2f}"
+                f"{result['queries']:>9.1f}{result['rps']:>9.1f}  {statuses}"
+            )
+            expected = self._expected(scenario)
+            if set(result['statuses']) - expected:
+                unexpected.append(name)
+                wanted = '/'.join(str(code) for code in sorted(expected))
+                self.stdout.write(self.style.ERROR(f'{line}  ✗ expected {wanted}'))
+            else:
+                results[name] = result
+                self.stdout.write(line)
+
+        if unexpected:
+            # Their timings measure a redirect or error page, not the view
+            self.stdout.write(self.style.ERROR(
+                f"\n✗ {len(unexpected)} routes answered with an unexpected status and are left out "
+                f"of the baseline and comparison: {', '.join(unexpected)}"
+            ))
+
+        if options['save_baseline']:
+            save_baseline(
+                options['save_baseline'], results,
+                requests=options['requests'], concurrency=options['concurrency'],
+                vendor=connections['default'].vendor,
+            )
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Baseline written to {options['save_baseline']}"))
+
+        if options['baseline']:
+            regressions = compare(results, load_baseline(options['baseline']), options['tolerance'])
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('\n✓ No regressions against baseline'))
+            for name, message in regressions:
+                self.stdout.write(self.style.ERROR(f'✗ {name}: {message}'))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} performance regressions detected')
+
+        if unexpected and options['fail_on_regression']:
+            raise CommandError(f'{len(unexpected)} routes answered with an unexpected status')
+
+    def _expected(self, scenario):
+        expected = scenario.get('expect', 200)
+        return {expected} if isinstance(expected, int) else set(expected)
+
+    def _context(self):
+        product_pk = Product.objects.filter(quantity__gt=0).values_list('pk', flat=True).first()
+        if product_pk is None:
+            raise CommandError('No products in stock; seed the database with populate_sample_data first')
+
+        # Committed rather than rolled back: concurrent clients and the replica
+        # read through their own connections. Existing users are never touched.
+        run = uuid.uuid4().hex[:8]
+        password = secrets.token_urlsafe(16)
+        users = {}
+        for role in BENCH_ROLES:
+            user = User.objects.create_user(
+                username=f'bench_{role.lower()}_{run}',
+                email=f'bench.{role.lower()}.{run}@example.com',
+                password=password,
+            )
+            # User.save derives the role from the email
+            User.objects.filter(pk=user.pk).update(role=role)
+            user.role = role
+            users[role] = user
+        return {'users': users, 'password': password, 'product_pk': product_pk, 'sessions': []}
+
+    def _cleanup(self, ctx):
+        """Delete the benchmark users and the sessions they were logged in with"""
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        for session_key in ctx['sessions']:
+            store(session_key=session_key).delete()
+        User.objects.filter(pk__in=[user.pk for user in ctx['users'].values()]).delete()
+
+    def _select(self, only):
+        if not only:
+            return SCENARIOS
+        patterns = [p.strip() for p in only.split(',') if p.strip()]
+        return {
+            name: scenario for name, scenario in SCENARIOS.items()
+            if any(fnmatch(name, pattern) for pattern in patterns)
+        }
+
+    def _uncovered_routes(self):
+        covered = {scenario.get('url_name', name) for name, scenario in SCENARIOS.items()}
+        return [p.name for p in core_urls.urlpatterns if p.name and p.name not in covered]
+
+    def _run(self, name, scenario, ctx, options):
+        local = threading.local()
+
+        def client_for(role):
+            if scenario.get('fresh_client'):
+                return Client(raise_request_exception=False)
+            clients = getattr(local, 'clients', None)
+            if clients is None:
+                clients = local.clients = {}
+            if role not in clients:
+                client = Client(raise_request_exception=False)
+                if role:
+                    client.force_login(ctx['users'][role])
+                    ctx['sessions'].append(client.session.session_key)
+                clients[role] = client
+            return clients[role]
+
+        def one_request(_):
+            client = client_for(scenario.get('role'))
+            queries = 0
+
+            def count_queries(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            with transaction.atomic():
+                if 'setup' in scenario:
+                    scenario['setup'](ctx)
+                if 'session' in scenario:
+                    session = client.session
+                    session.update(scenario['session'](ctx))
+                    session.save()
+                kwargs = scenario['kwargs'](ctx) if 'kwargs' in scenario else None
+                url = reverse(scenario.get('url_name', name), kwargs=kwargs)
+                data = scenario['data'](ctx) if 'data' in scenario else scenario.get('query')
+                method = getattr(client, scenario.get('method', 'get'))
+                extra = {}
+                if scenario.get('json'):
+                    data, extra = json.dumps(data), {'content_type': 'application/json'}
+
+                # Reporting views read from the replica alias
+                with ExitStack() as wrappers:
+                    for conn in connections.all():
+                        wrappers.enter_context(conn.execute_wrapper(count_queries))
+                    start = time.perf_counter()
+                    response = method(url, data, **extra)
+                    elapsed = (time.perf_counter() - start) * 1000
+                transaction.set_rollback(True)
+            return elapsed, queries, response.status_code
+
+        if options['concurrency'] > 1:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                list(pool.map(one_request, range(options['warmup'])))
+                start = time.perf_counter()
+                samples = list(pool.map(one_request, range(options['requests'])))
+                wall = time.perf_counter() - start
+        else:
+            list(map(one_request, range(options['warmup'])))
+            start = time.perf_counter()
+            samples = list(map(one_request, range(options['requests'])))
+            wall = time.perf_counter() - start
+
+        statuses = {}
+        for _, _, status in samples:
+            statuses[status] = statuses.get(status, 0) + 1
+
+        result = summarize([s[0] for s in samples], wall)
+        result['queries'] = round(sum(s[1] for s in samples) / len(samples), 1) if samples else 0.0
+        result['statuses'] = statuses
+        return result
@@ -0,0 +1,54 @@
+"""
+Management command to delete expired sessions in batches
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired database sessions in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Sessions deleted per statement (default: 5000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches to spare the primary DB'
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write(self.style.WARNING('Signed-cookie sessions are not stored; nothing to clean up'))
+            return
+
+        batch_size = options['batch_size']
+        now = timezone.now()
+        total = 0
+        batches = 0
+
+        while True:
+            # expire_date is indexed, so each batch is a short range scan
+            pks = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            deleted, _ = Session.objects.filter(pk__in=pks).delete()
+            total += deleted
+            batches += 1
+            self.stdout.write(f'  batch {batches}: deleted {deleted} sessions')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {total} expired sessions in {batches} batches'))
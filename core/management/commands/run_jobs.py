@@ -0,0 +1,90 @@
+"""
+Management command that works through the background job queue
+"""
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.utils import jobs
+
+# Seconds between housekeeping passes (stale lock recovery, purging,
+# scheduling periodic jobs)
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Jobs claimed per batch (default: 50)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no due jobs are left instead of polling'
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            default=7,
+            help='Delete finished jobs older than this many days (default: 7)'
+        )
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        previous = {sig: signal.signal(sig, self._stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self._work(options)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def _work(self, options):
+        worker = jobs.worker_id()
+        self.stdout.write(f'Worker {worker} started')
+        succeeded = failed = 0
+        next_housekeeping = 0.0
+
+        while not self._stopping:
+            if time.monotonic() >= next_housekeeping:
+                self._housekeeping(options['purge_days'])
+                next_housekeeping = time.monotonic() + HOUSEKEEPING_INTERVAL
+
+            done, errors = jobs.run_batch(worker, options['batch_size'])
+            succeeded += done
+            failed += errors
+            if done or errors:
+                self.stdout.write(f'  batch: {done} done, {errors} failed')
+                continue
+
+            if options['once']:
+                break
+            # Drop connections the database may have timed out while idle
+            close_old_connections()
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Worker stopped: {succeeded} jobs done, {failed} failed'))
+
+    def _housekeeping(self, purge_days):
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'  requeued {requeued} jobs from dead workers'))
+        jobs.purge_done(timedelta(days=purge_days))
+        jobs.schedule_periodic()
+
+    def _stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self._stopping = True
@@ -0,0 +1,77 @@
+"""
+Management command to aggregate the slow query log per SQL fingerprint
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.utils.slow_queries import read_entries
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow query log grouped by normalized SQL fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log',
+            default=None,
+            help='Path to the slow query log (default: settings.SLOW_QUERY_LOG)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of fingerprints to show (default: 20)'
+        )
+        parser.add_argument(
+            '--order-by',
+            choices=['total', 'count', 'max'],
+            default='total',
+            help='Sort by total time, occurrence count or worst case'
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Print the most recent EXPLAIN plan for each fingerprint'
+        )
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        groups = {}
+
+        for entry in read_entries(path):
+            group = groups.setdefault(entry['fingerprint'], {
+                'sql': entry['normalized_sql'],
+                'count': 0,
+                'total': 0.0,
+                'max': 0.0,
+                'origins': {},
+                'explain': None,
+            })
+            group['count'] += 1
+            group['total'] += entry['duration_ms']
+            group['max'] = max(group['max'], entry['duration_ms'])
+            origin = entry.get('origin') or 'unknown'
+            group['origins'][origin] = group['origins'].get(origin, 0) + 1
+            if entry.get('explain'):
+                group['explain'] = entry['explain']
+
+        if not groups:
+            self.stdout.write(self.style.WARNING(f'No slow queries logged in {path}'))
+            return
+
+        ranked = sorted(groups.items(), key=lambda item: item[1][options['order_by']], reverse=True)
+        self.stdout.write(self.style.SUCCESS(f'{len(groups)} slow query fingerprints in {path}\n'))
+
+        for fingerprint, group in ranked[:options['limit']]:
+            avg = group['total'] / group['count']
+            self.stdout.write(self.style.SUCCESS(
+                f"[{fingerprint}] {group['count']}x  total {group['total']:.1f}ms  "
+                f"avg {avg:.1f}ms  max {group['max']:.1f}ms"
+            ))
+            self.stdout.write(f"  {group['sql']}")
+            for origin, count in sorted(group['origins'].items(), key=lambda item: -item[1]):
+                self.stdout.write(f'  from {origin} ({count}x)')
+            if options['explain'] and group['explain']:
+                for line in group['explain']:
+                    self.stdout.write(f'    {line}')
+            self.stdout.write('')
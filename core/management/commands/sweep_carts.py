@@ -0,0 +1,55 @@
+"""
+Management command to delete abandoned carts in batches
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.utils.cart_store import SWEEP_BATCH_SIZE, delete_idle_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete stored carts nobody has changed for a number of days, in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.CART_IDLE_DAYS,
+            help=f'Delete carts idle for this many days (default: {settings.CART_IDLE_DAYS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help=f'Carts deleted per statement (default: {SWEEP_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches to spare the primary DB'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        carts_total = items_total = batches = 0
+
+        while True:
+            carts, items = delete_idle_carts(cutoff, options['batch_size'])
+            if not carts:
+                break
+            carts_total += carts
+            items_total += items
+            batches += 1
+            self.stdout.write(f'  batch {batches}: deleted {carts} carts, {items} items')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Deleted {carts_total} carts and {items_total} items idle since {cutoff:%Y-%m-%d} '
+            f'in {batches} batches'
+        ))
@@ -0,0 +1,46 @@
+"""
+Management command to preload the cache at deploy time
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from core.utils import catalog
+from core.utils.benchmark import timed
+from core.utils.valuation import inventory_valuation
+
+
+class Command(BaseCommand):
+    help = 'Preload cached catalog data, categories and dashboard KPIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Clear the whole cache before warming it'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f"Warming '{settings.CACHE_BACKEND}' cache..."
+        ))
+
+        if options['clear']:
+            cache.clear()
+            self.stdout.write('✓ Cleared existing entries')
+
+        steps = [
+            ('Categories', catalog.categories),
+            ('Featured products', catalog.featured_products),
+            ('Dashboard KPIs', catalog.dashboard_kpis),
+            ('Inventory valuation', inventory_valuation),
+        ]
+        for label, loader in steps:
+            _, elapsed = timed(loader)
+            self.stdout.write(self.style.SUCCESS(f'✓ {label} ({elapsed:.1f}ms)'))
+
+        if settings.CACHE_BACKEND == 'locmem':
+            self.stdout.write(self.style.WARNING(
+                '⚠ locmem caches are per process; entries warmed here are not '
+                'visible to the web workers. Use CACHE_BACKEND=sqlite or redis.'
+            ))
@@ -0,0 +1,271 @@
+"""
+Middleware for Supermart application
+"""
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.backends.django import Template
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .routers import RoutingState, current_routing
+from .utils import perf
+from .utils.generations import CATEGORY, STOCK, generation_key
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively on both the WSGI and ASGI paths.
+
+    Subclasses implement __call__ for the sync path and __acall__ for the
+    async one, so async views are not pushed onto a thread per request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        stats = perf.current_request.get()
+        if stats is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_ms += (time.perf_counter() - start) * 1000
+    wrapper._perf_timed = True
+    return wrapper
+
+
+def _install_template_timer():
+    if not getattr(Template.render, '_perf_timed', False):
+        Template.render = _timed_render(Template.render)
+
+
+class PerformanceMiddleware(HybridMiddleware):
+    """
+    Record wall time, DB queries and template render time per view.
+
+    Timings are sent back in a Server-Timing header and aggregated into
+    an in-process histogram (see core.utils.perf). Queries are counted by
+    perf.query_timer, which every connection carries.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        _install_template_timer()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        stats = perf.RequestStats()
+        token = perf.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.current_request.reset(token)
+        return self._finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats = perf.RequestStats()
+        token = perf.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.current_request.reset(token)
+        return self._finish(request, response, stats, start)
+
+    def _finish(self, request, response, stats, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        size = 0 if response.streaming else len(response.content)
+        perf.record(view_name, wall_ms, stats, size)
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={wall_ms:.1f}',
+            f'db;dur={stats.db_ms:.1f};desc="{stats.query_count} queries"',
+            f'tpl;dur={stats.template_ms:.1f}',
+        ])
+        return response
+
+
+class AnonymousPageCacheMiddleware(HybridMiddleware):
+    """
+    Serve whole catalog pages from the cache to anonymous visitors.
+
+    Placed before SessionMiddleware: a hit never loads a session or the
+    message storage. Only requests without session or messages cookies
+    are considered, and only responses that set no cookies are stored.
+    Entries are keyed on path and normalized query string and versioned
+    by the stock and category generation counters.
+    """
+
+    CACHEABLE_VIEWS = {'home', 'products_list', 'product_detail'}
+    STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        key, entry = self._lookup(request)
+        if entry is not None:
+            return self._from_cache(request, entry)
+        response = self.get_response(request)
+        if key is not None:
+            self._store(key, response)
+        return response
+
+    async def __acall__(self, request):
+        key, entry = await sync_to_async(self._lookup)(request)
+        if entry is not None:
+            return self._from_cache(request, entry)
+        response = await self.get_response(request)
+        if key is not None:
+            await sync_to_async(self._store)(key, response)
+        return response
+
+    def _lookup(self, request):
+        key = self._cache_key(request)
+        return key, (cache.get(key) if key is not None else None)
+
+    def _store(self, key, response):
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            cache.set(key, {
+                'content': response.content,
+                'headers': {h: response[h] for h in self.STORED_HEADERS if response.has_header(h)},
+            }, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+
+    def _cache_key(self, request):
+        if not settings.PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or 'messages' in request.COOKIES:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.url_name not in self.CACHEABLE_VIEWS:
+            return None
+        # Lets PerformanceMiddleware attribute cache hits to the view
+        request.resolver_match = match
+
+        query = urlencode(sorted((k, v) for k, v in parse_qsl(request.META.get('QUERY_STRING', '')) if v))
+        return f'page:{generation_key(STOCK, CATEGORY)}:{request.path_info}?{query}'
+
+    def _from_cache(self, request, entry):
+        response = HttpResponse(entry['content'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+        response['X-Page-Cache'] = 'HIT'
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+            response=response,
+        )
+
+
+class LazySessionRefreshMiddleware(HybridMiddleware):
+    """
+    Extend session expiry only when little of its lifetime is left.
+
+    Replaces SESSION_SAVE_EVERY_REQUEST: an unmodified session is written
+    back (and its cookie re-issued) only once less than
+    SESSION_REFRESH_THRESHOLD of SESSION_COOKIE_AGE remains. Must come
+    after SessionMiddleware.
+    """
+
+    KEY = '_refreshed_at'
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._refresh(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # Only touches a session that was already loaded; no I/O here
+        self._refresh(request)
+        return response
+
+    def _refresh(self, request):
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.is_empty():
+            return
+
+        now = int(time.time())
+        refreshed_at = session.get(self.KEY)
+        if session.modified or refreshed_at is None:
+            session[self.KEY] = now
+        else:
+            remaining = settings.SESSION_COOKIE_AGE - (now - refreshed_at)
+            if remaining < settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_THRESHOLD:
+                session[self.KEY] = now
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Track writes per client so @read_replica views keep read-your-writes.
+
+    A request that writes sets a short-lived cookie; while it is present
+    the client's reads stay on the primary, which the replica may still be
+    catching up with. Goes after the session middleware so session saves
+    do not count as writes.
+    """
+
+    COOKIE = 'replica_pin'
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        state, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self._finish(state, response)
+
+    def _start(self, request):
+        state = RoutingState(pinned=self.COOKIE in request.COOKIES)
+        return state, current_routing.set(state)
+
+    def _finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                self.COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('razorpay_payment_id', models.CharField(max_length=100, unique=True)),
+                ('razorpay_order_id', models.CharField(max_length=100)),
+                ('razorpay_signature', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(max_length=20)),
+                ('source', models.CharField(choices=[('CALLBACK', 'Checkout Callback'), ('WEBHOOK', 'Webhook'), ('RECONCILE', 'Reconciliation')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='razorpay_order_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 09:34
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Fold repeated (cart, product) rows into the oldest one before the constraint"""
+    CartItem = apps.get_model('core', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        items = CartItem.objects.filter(cart_id=row['cart_id'], product_id=row['product_id'])
+        items.filter(id=row['keep']).update(quantity=row['total'])
+        items.exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_order_status_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='core_cartitem_unique_product'),
+        ),
+    ]
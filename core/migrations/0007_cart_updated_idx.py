@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_cartitem_unique_product'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at'], name='core_cart_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-19 09:41
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def clear_duplicate_emails(apps, schema_editor):
+    """
+    Leave each case-insensitive email on its oldest account only.
+
+    Emails differing only in case could not log in unambiguously anyway;
+    the newer accounts keep their username and data but lose the email.
+    """
+    User = apps.get_model('core', 'User')
+    duplicates = (
+        User.objects.exclude(email='')
+        .values(email_lower=Lower('email'))
+        .annotate(rows=Count('id'), keep=Min('id'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        (
+            User.objects.alias(email_lower=Lower('email'))
+            .filter(email_lower=row['email_lower'])
+            .exclude(id=row['keep'])
+            .update(email='')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0007_cart_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='core_user_email_ci_unique'),
+        ),
+    ]
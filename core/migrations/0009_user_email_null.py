@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-19 10:04
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def blank_emails_to_null(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    User.objects.filter(email='').update(email=None)
+
+
+def null_emails_to_blank(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    User.objects.filter(email=None).update(email='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0008_user_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='user',
+            name='core_user_email_ci_unique',
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, null=True, verbose_name='email address'),
+        ),
+        migrations.RunPython(blank_emails_to_null, null_emails_to_blank),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='core_user_email_ci_unique'),
+        ),
+    ]
@@ -2,6 +2,7 @@
 Core models for Supermart application
 """
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
@@ -16,15 +17,27 @@ class User(AbstractUser):
         ('CUSTOMER', 'Customer'),
     ]
     
+    # NULL rather than '' for users without an email, so the case-insensitive
+    # unique index needs no condition (MySQL has no partial indexes)
+    email = models.EmailField('email address', blank=True, null=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='CUSTOMER')
     phone = models.CharField(max_length=15, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Login and registration look users up by LOWER(email) (see core.backends)
+            models.UniqueConstraint(Lower('email'), name='core_user_email_ci_unique'),
+        ]
+    
     def save(self, *args, **kwargs):
         # Auto-assign role based on email domain and prefix
         # Only @supermart.com users can be ADMIN, MANAGER, or STAFF
         # All other emails are CUSTOMER
         
+        if not self.email:
+            self.email = None
+        
         if self.email and '@supermart.com' in self.email:
             email_prefix = self.email.split('@')[0].lower()
             
@@ -93,6 +106,12 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # sweep_carts walks idle carts oldest first
+            models.Index(fields=['updated_at'], name='core_cart_updated_idx'),
+        ]
+    
     def __str__(self):
         return f"Cart - {self.user.username}"
     
@@ -112,6 +131,12 @@ class CartItem(models.Model):
     quantity = models.IntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [
+            # Saving a cart upserts on this pair (see core.utils.cart_store)
+            models.UniqueConstraint(fields=['cart', 'product'], name='core_cartitem_unique_product'),
+        ]
+    
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
     
@@ -143,7 +168,7 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='PENDING')
     order_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
-    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     razorpay_signature = models.CharField(max_length=200, blank=True, null=True)
     shipping_address = models.TextField()
@@ -157,6 +182,22 @@ class Order(models.Model):
         ordering = ['-created_at']
 
 
+class OrderStatusChange(models.Model):
+    """Audit trail of order status transitions (see core.utils.order_states)"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.order_id}: {self.from_status} -> {self.to_status}"
+    
+    class Meta:
+        ordering = ['created_at']
+
+
 class OrderItem(models.Model):
     """Order Items"""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -234,3 +275,61 @@ class StockEntry(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Stock Entries'
+
+
+class Job(models.Model):
+    """Background job in the database-backed queue (see core.utils.jobs)"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The worker polls for due pending jobs
+            models.Index(fields=['status', 'run_after'], name='core_job_due_idx'),
+        ]
+
+
+class PaymentEvent(models.Model):
+    """Inbox of verified payment callbacks and webhooks, applied in batches"""
+    SOURCE_CHOICES = [
+        ('CALLBACK', 'Checkout Callback'),
+        ('WEBHOOK', 'Webhook'),
+        ('RECONCILE', 'Reconciliation'),
+    ]
+    
+    # Unique so a redelivered callback or webhook is stored only once
+    razorpay_payment_id = models.CharField(max_length=100, unique=True)
+    razorpay_order_id = models.CharField(max_length=100)
+    razorpay_signature = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=20)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.razorpay_payment_id} ({self.status})"
+    
+    class Meta:
+        ordering = ['id']
@@ -0,0 +1,102 @@
+"""
+Database routing between the primary and the read replica
+
+Only views marked with @read_replica read from the replica, and only for
+clients that have not written anything recently (read-your-writes). All
+writes, every read outside those views, and reads that fill caches keyed by
+the primary's generations go to the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+class RoutingState:
+    """Replica eligibility for the request being processed"""
+
+    __slots__ = ('pinned', 'use_replica', 'wrote')
+
+    def __init__(self, pinned=False):
+        # Pinned clients wrote within REPLICA_STICKY_SECONDS and read the primary
+        self.pinned = pinned
+        self.use_replica = False
+        self.wrote = False
+
+    @property
+    def reads_replica(self):
+        return self.use_replica and not (self.pinned or self.wrote)
+
+
+def replica_configured():
+    if REPLICA not in settings.DATABASES:
+        return False
+    # A test mirror points at the primary's own database; reading it through
+    # a second connection would not see the primary's open transaction
+    replica, primary = connections[REPLICA].settings_dict, connections[DEFAULT_DB_ALIAS].settings_dict
+    return (replica['NAME'], replica['HOST']) != (primary['NAME'], primary['HOST'])
+
+
+@contextmanager
+def replica_reads(state=None):
+    """Route reads to the replica for the duration of the block"""
+    if state is None:
+        state = current_routing.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = current_routing.set(state)
+    previous, state.use_replica = state.use_replica, True
+    try:
+        yield state
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            current_routing.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Route reads to the primary for the duration of the block, even inside
+    a replica block. Used to fill caches keyed by the primary's generations,
+    which a lagging replica could otherwise fill with older data.
+    """
+    state = current_routing.get()
+    if state is None:
+        yield None
+        return
+    previous, state.use_replica = state.use_replica, False
+    try:
+        yield state
+    finally:
+        state.use_replica = previous
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS entry for the primary/replica pair"""
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is not None and state.reads_replica and replica_configured():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica follows the primary; it is never migrated directly
+        return db != REPLICA
@@ -0,0 +1,56 @@
+"""
+Signal handlers for Supermart models
+"""
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from supermart_project.database import apply_sqlite_pragmas
+
+from .decorators import remember_role, role_generation
+from .models import User, Product, Category, Order
+from .utils import perf, slow_queries
+from .utils.generations import CATEGORY, STOCK, bump_generation_on_commit
+from .utils.order_summary import invalidate_summaries
+from .utils.stock_events import broker
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, **kwargs):
+    bump_generation_on_commit(STOCK)
+
+
+@receiver(post_save, sender=Product)
+def publish_stock_level(sender, instance, **kwargs):
+    # Stock entries and checkout both save the product; notify SSE clients once committed
+    product_id, quantity, threshold = instance.pk, instance.quantity, instance.low_stock_threshold
+    transaction.on_commit(lambda: broker.publish(product_id, quantity, threshold))
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    # Checkout updates the cached summary in place; deletions just drop it
+    invalidate_summaries([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, **kwargs):
+    bump_generation_on_commit(STOCK, CATEGORY)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Role, activation or password may have changed; sessions re-check the user
+    bump_generation_on_commit(role_generation(instance.pk))
+
+
+@receiver(user_logged_in)
+def store_role(sender, request, user, **kwargs):
+    remember_role(request, user)
+
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='core.sqlite_pragmas')
+connection_created.connect(slow_queries.install, dispatch_uid='core.slow_queries')
+connection_created.connect(perf.install, dispatch_uid='core.perf')
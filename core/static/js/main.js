@@ -464,6 +464,92 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// ==================== ADD TO CART ====================
+
+// Links marked data-add-to-cart add the product without leaving the page;
+// a click while one is in flight is ignored rather than sent twice.
+function showAlert(text, tag) {
+    let container = document.querySelector('.messages-container');
+    if (!container) {
+        container = document.createElement('div');
+        container.className = 'messages-container';
+        document.querySelector('.navbar').after(container);
+    }
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-' + tag;
+    alert.textContent = text;
+    container.appendChild(alert);
+    setTimeout(function() {
+        alert.style.opacity = '0';
+        setTimeout(function() {
+            alert.remove();
+        }, 300);
+    }, 5000);
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('[data-add-to-cart]').forEach(function(link) {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+            if (link.dataset.busy) {
+                return;
+            }
+            link.dataset.busy = '1';
+
+            fetch(link.href, {
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                },
+                credentials: 'same-origin'
+            })
+            .then(response => response.json())
+            .then(data => showAlert(data.message, data.success ? 'success' : 'error'))
+            .catch(function() {
+                // Fall back to the plain link
+                window.location = link.href;
+            })
+            .finally(function() {
+                delete link.dataset.busy;
+            });
+        });
+    });
+});
+
+// ==================== LIVE STOCK LEVELS ====================
+
+// Elements marked data-stock-product="<id>" get their [data-stock-quantity]
+// child updated from the server-sent stock stream instead of page reloads.
+document.addEventListener('DOMContentLoaded', function() {
+    const stockElements = document.querySelectorAll('[data-stock-product]');
+    if (!stockElements.length || !window.EventSource) {
+        return;
+    }
+
+    const productIds = Array.from(new Set(
+        Array.from(stockElements).map(el => el.dataset.stockProduct)
+    ));
+
+    function applyLevel(level) {
+        document.querySelectorAll(`[data-stock-product="${level.product}"]`).forEach(el => {
+            const quantity = el.querySelector('[data-stock-quantity]');
+            if (quantity) {
+                quantity.textContent = level.quantity;
+            }
+            el.classList.toggle('low-stock', level.low_stock);
+        });
+    }
+
+    const source = new EventSource('/api/stock/stream/?products=' + productIds.join(','));
+    source.addEventListener('snapshot', event => JSON.parse(event.data).forEach(applyLevel));
+    source.addEventListener('stock', event => applyLevel(JSON.parse(event.data)));
+    source.onerror = function() {
+        // Served only by the ASGI app; stop retrying against a WSGI deployment
+        if (source.readyState === EventSource.CLOSED) {
+            source.close();
+        }
+    };
+});
+
 // ==================== UTILITIES ====================
 
 // Format currency
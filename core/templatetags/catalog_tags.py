@@ -0,0 +1,70 @@
+"""
+Template tags for cached catalog fragments
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.utils.generations import CATEGORY, get_generation
+
+register = template.Library()
+
+CARD_TIMEOUT = 60 * 60 * 24
+# Category menus are keyed by the category generation, which only reaches
+# every worker through a shared cache
+MENU_TIMEOUT = 60 * 60 * 24
+# Bump when the card templates change so cached HTML is not served
+CARD_VERSION = 3
+
+
+@register.simple_tag
+def category_generation():
+    """Current category generation, for use as a {% cache %} vary-on value"""
+    return get_generation(CATEGORY)
+
+
+@register.simple_tag
+def category_menu_timeout():
+    """{% cache %} timeout for category menus; 0 (not cached) without a shared cache"""
+    return MENU_TIMEOUT if settings.CACHE_SHARED else 0
+
+
+def _card_key(template_name, product, category_gen, authenticated):
+    updated = product.updated_at.timestamp() if product.updated_at else ''
+    return f'fragment:v{CARD_VERSION}:{template_name}:{product.pk}:{updated}:{category_gen}:{int(authenticated)}'
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products, template_name='partials/product_card.html'):
+    """
+    Render one card per product, reusing cached HTML.
+
+    Cards are keyed on the product's updated_at, the category generation
+    and whether the visitor is logged in, and fetched with one get_many
+    per page so only changed products are rendered again.
+    """
+    products = list(products)
+    if not products:
+        return ''
+
+    user = context.get('user')
+    authenticated = bool(user and user.is_authenticated)
+    category_gen = get_generation(CATEGORY)
+
+    keys = [_card_key(template_name, product, category_gen, authenticated) for product in products]
+    cached = cache.get_many(keys)
+
+    rendered = {}
+    cards = []
+    for key, product in zip(keys, products):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(template_name, {'product': product, 'user': user})
+            rendered[key] = card
+        cards.append(card)
+
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return mark_safe(''.join(cards))
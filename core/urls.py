@@ -1,8 +1,12 @@
 """
 URL Configuration for core app
 """
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Catalog and chatbot views run natively async when served by the ASGI app
+catalog_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
 
@@ -15,8 +19,8 @@ urlpatterns = [
     path('logout/', views.user_logout, name='logout'),
 
     # Products
-    path('products/', views.products_list, name='products_list'),
-    path('product/<int:pk>/', views.product_detail, name='product_detail'),
+    path('products/', catalog_views.products_list, name='products_list'),
+    path('product/<int:pk>/', catalog_views.product_detail, name='product_detail'),
 
     # Cart
     path('cart/', views.cart_view, name='cart_view'),
@@ -39,10 +43,15 @@ urlpatterns = [
 
     # Staff Views
     path('staff/stock-entry/', views.stock_entry_view, name='stock_entry_view'),
+    path('staff/performance/', views.performance_stats, name='performance_stats'),
+    path('staff/orders/', views.staff_orders, name='staff_orders'),
 
     # Manager Views
     path('manager/inventory/', views.manager_inventory, name='manager_inventory'),
     path('manager/approvals/', views.manager_approvals, name='manager_approvals'),
+    path('manager/valuation/', views.manager_valuation, name='manager_valuation'),
+    path('manager/products/bulk-update/', views.manager_bulk_update, name='manager_bulk_update'),
+    path('manager/valuation/export/', views.manager_valuation_export, name='manager_valuation_export'),
 
     # Admin Views
     path('admin/users/', views.user_management, name='user_management'),
@@ -50,6 +59,19 @@ urlpatterns = [
     path('admin/reports/', views.purchase_reports, name='purchase_reports'),
     path('admin/analytics/', views.analytics_view, name='analytics'),
 
+    # Catalog API
+    path('api/products/', views.api_products, name='api_products'),
+    path('api/products/<int:pk>/', views.api_product_detail, name='api_product_detail'),
+    path('api/categories/', views.api_categories, name='api_categories'),
+    path('api/stock/', views.api_stock, name='api_stock'),
+    path('api/stock/stream/', async_views.stock_stream, name='stock_stream'),
+
     # Chatbot
-    path('api/chatbot/', views.chatbot_api, name='chatbot_api'),
+    path('api/chatbot/', catalog_views.chatbot_api, name='chatbot_api'),
+    
+    # Payments
+    path('payment/callback/', views.payment_callback, name='payment_callback'),
+    path('payment/webhook/', views.payment_webhook, name='payment_webhook'),
+    path('payment/success/<str:order_id>/', views.payment_success, name='payment_success'),
+    path('payment/failure/', views.payment_failure, name='payment_failure'),
 ]
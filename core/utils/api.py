@@ -0,0 +1,93 @@
+"""
+Helpers for the read-only JSON catalog API
+"""
+import hashlib
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .generations import generation_key
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class APIError(Exception):
+    """Raised for invalid API parameters; rendered as a JSON 400"""
+
+
+def error_response(exc):
+    return JsonResponse({"error": str(exc)}, status=400)
+
+
+def parse_fields(request, field_map, default):
+    """
+    Map a ?fields=a,b,c projection onto ORM lookups.
+
+    `field_map` maps public field names to the lookups passed to
+    values(); `default` is used when no projection is requested.
+    """
+    raw = request.GET.get("fields")
+    names = [name.strip() for name in raw.split(",") if name.strip()] if raw else list(default)
+    unknown = [name for name in names if name not in field_map]
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(field_map)}")
+    if "id" not in names:
+        names.insert(0, "id")
+    return {name: field_map[name] for name in names}
+
+
+def parse_int(request, name, default=None, minimum=None, maximum=None):
+    value = request.GET.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise APIError(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise APIError(f"'{name}' must be at least {minimum}")
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def keyset_page(request, queryset, fields):
+    """
+    Return one page of rows ordered by id, plus the next-page URL.
+
+    Uses ?after=<last id> instead of OFFSET so every page is an index
+    range scan regardless of depth. Rows come straight from values();
+    no model instances are built.
+    """
+    limit = parse_int(request, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    after = parse_int(request, "after")
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+
+    rows = list(queryset.order_by("pk").values(*fields.values())[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    results = [{name: row[lookup] for name, lookup in fields.items()} for row in rows]
+
+    next_url = None
+    if has_more:
+        params = request.GET.copy()
+        params["after"] = results[-1]["id"]
+        next_url = f"{request.path}?{params.urlencode()}"
+    return results, next_url
+
+
+def api_etag(request, *generations):
+    """
+    ETag from the data generations and the full query; costs no DB queries.
+
+    Only produced when the generations live in a shared cache. With a
+    per-process cache a worker never sees the bumps made by the others and
+    would keep answering 304 for data that has changed.
+    """
+    if not settings.CACHE_SHARED:
+        return None
+    raw = f"{generation_key(*generations)}:{request.get_full_path()}"
+    return hashlib.md5(raw.encode()).hexdigest()
@@ -0,0 +1,69 @@
+"""
+Helpers shared by the benchmark management commands
+"""
+import json
+import math
+import time
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_ms, wall_seconds=None):
+    """Return p50/p95/p99/mean latency and throughput for one benchmark"""
+    count = len(latencies_ms)
+    summary = {
+        'requests': count,
+        'p50': round(percentile(latencies_ms, 50), 2),
+        'p95': round(percentile(latencies_ms, 95), 2),
+        'p99': round(percentile(latencies_ms, 99), 2),
+        'mean': round(sum(latencies_ms) / count, 2) if count else 0.0,
+    }
+    if wall_seconds:
+        summary['rps'] = round(count / wall_seconds, 1)
+    return summary
+
+
+def timed(func, *args, **kwargs):
+    """Call func and return (result, elapsed milliseconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_baseline(path, results, **meta):
+    with open(path, 'w') as handle:
+        json.dump({'meta': meta, 'results': results}, handle, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=0.2, noise_floor_ms=1.0):
+    """
+    Compare results against a stored baseline.
+
+    Returns a list of (name, message) for every benchmark whose p95 grew
+    by more than `tolerance` (and more than `noise_floor_ms`) or that now
+    issues more queries than before.
+    """
+    regressions = []
+    base_results = baseline.get('results', {})
+    for name, current in results.items():
+        base = base_results.get(name)
+        if not base:
+            continue
+        limit = base['p95'] * (1 + tolerance)
+        if current['p95'] > limit and current['p95'] - base['p95'] > noise_floor_ms:
+            regressions.append((name, f"p95 {base['p95']}ms -> {current['p95']}ms"))
+        if 'queries' in base and current.get('queries', 0) > base['queries']:
+            regressions.append((name, f"queries {base['queries']} -> {current['queries']}"))
+    return regressions
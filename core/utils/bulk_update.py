@@ -0,0 +1,127 @@
+"""
+Bulk price / threshold / supplier updates keyed by SKU
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Product
+from .generations import STOCK, bump_generation_on_commit
+
+UPDATABLE_FIELDS = ('price', 'low_stock_threshold', 'supplier')
+BATCH_SIZE = 1000
+# Keeps each prefetch IN (...) under SQLite's bound-parameter limit
+PREFETCH_CHUNK = 500
+
+MAX_PRICE = Decimal('99999999.99')
+
+
+def parse_csv(uploaded_file):
+    """Read sku,price,low_stock_threshold,supplier rows from an uploaded CSV"""
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or 'sku' not in reader.fieldnames:
+        raise ValueError("CSV must have a header row with a 'sku' column")
+    return [
+        {key.strip(): (value or '').strip() for key, value in row.items() if key}
+        for row in reader
+    ]
+
+
+def _clean(row):
+    """Return ({field: value}, errors) for one input row; blank cells are left unchanged"""
+    changes, errors = {}, []
+
+    price = str(row.get('price', '') or '').strip()
+    if price:
+        try:
+            value = Decimal(price).quantize(Decimal('0.01'))
+            if not Decimal('0') < value <= MAX_PRICE:
+                raise InvalidOperation
+            changes['price'] = value
+        except (InvalidOperation, ValueError):
+            errors.append(f"invalid price '{price}'")
+
+    threshold = str(row.get('low_stock_threshold', '') or '').strip()
+    if threshold:
+        try:
+            value = int(threshold)
+            if value < 0:
+                raise ValueError
+            changes['low_stock_threshold'] = value
+        except ValueError:
+            errors.append(f"invalid low_stock_threshold '{threshold}'")
+
+    supplier = str(row.get('supplier', '') or '').strip()
+    if supplier:
+        if len(supplier) > Product._meta.get_field('supplier').max_length:
+            errors.append('supplier is too long')
+        else:
+            changes['supplier'] = supplier
+
+    return changes, errors
+
+
+def _prefetch(skus):
+    products = {}
+    for start in range(0, len(skus), PREFETCH_CHUNK):
+        chunk = skus[start:start + PREFETCH_CHUNK]
+        for product in Product.objects.filter(sku__in=chunk).only('id', 'sku', *UPDATABLE_FIELDS):
+            products[product.sku] = product
+    return products
+
+
+def apply_product_updates(rows, batch_size=BATCH_SIZE):
+    """
+    Validate and apply SKU-keyed updates all-or-nothing.
+
+    Every row is checked in memory against a single prefetch of the
+    affected products; nothing is written if any row is invalid.
+    Valid changes are saved with bulk_update in batches inside one
+    transaction. Returns {'updated': int, 'errors': [str]}.
+    """
+    errors = []
+    seen = set()
+    for line, row in enumerate(rows, start=1):
+        sku = str(row.get('sku', '') or '').strip()
+        if not sku:
+            errors.append(f'Row {line}: missing sku')
+        elif sku in seen:
+            errors.append(f'Row {line}: duplicate sku {sku}')
+        seen.add(sku)
+
+    products = _prefetch(sorted(seen - {''}))
+
+    changed = []
+    fields = set()
+    now = timezone.now()
+    for line, row in enumerate(rows, start=1):
+        sku = str(row.get('sku', '') or '').strip()
+        if not sku:
+            continue
+        product = products.get(sku)
+        if product is None:
+            errors.append(f'Row {line}: unknown sku {sku}')
+            continue
+        changes, row_errors = _clean(row)
+        errors.extend(f'Row {line} ({sku}): {error}' for error in row_errors)
+        changes = {f: v for f, v in changes.items() if getattr(product, f) != v}
+        if changes:
+            for field, value in changes.items():
+                setattr(product, field, value)
+            # bulk_update skips auto_now; cached product cards are keyed on it
+            product.updated_at = now
+            fields.update(changes)
+            changed.append(product)
+
+    if errors:
+        return {'updated': 0, 'errors': errors}
+
+    if changed:
+        with transaction.atomic():
+            Product.objects.bulk_update(changed, sorted(fields) + ['updated_at'], batch_size=batch_size)
+            bump_generation_on_commit(STOCK)
+    return {'updated': len(changed), 'errors': []}
@@ -0,0 +1,246 @@
+"""
+Cart storage outside the database
+
+Logged-in customers keep their cart in the session and anonymous visitors
+in a signed cookie, so adding to or editing the cart writes no cart rows.
+The database Cart is the durable copy: the cookie cart is merged into it
+at login, the session cart is written back at logout, and checkout
+consumes it. Stored carts left idle for CART_IDLE_DAYS are swept away in
+batches by the sweep_carts command and the carts.sweep job.
+"""
+import json
+from abc import ABC, abstractmethod
+
+from django.db import connection, transaction
+
+from core.models import Cart, CartItem, Product
+
+SESSION_KEY = 'cart'
+COOKIE_NAME = 'cart'
+COOKIE_SALT = 'core.cart_store'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+# Keeps the signed cookie well under the 4KB browser limit
+MAX_LINES = 50
+SWEEP_BATCH_SIZE = 1000
+
+
+def _clean(items):
+    """Keep only well-formed {product_id: quantity} entries"""
+    if not isinstance(items, dict):
+        return {}
+    cleaned = {}
+    for product_id, quantity in items.items():
+        if str(product_id).isdigit() and isinstance(quantity, int) and quantity > 0:
+            cleaned[str(product_id)] = quantity
+        if len(cleaned) >= MAX_LINES:
+            break
+    return cleaned
+
+
+class CartLine:
+    """A product and quantity, shaped like CartItem for the templates"""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def subtotal(self):
+        return self.product.price * self.quantity
+
+
+class StoredCart(ABC):
+    """
+    Product id -> quantity, loaded once per request.
+
+    Changes are kept on the instance until persist() writes them to the
+    store along with the response.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.items = self.load()
+        self.modified = False
+        self._lines = None
+
+    @abstractmethod
+    def load(self):
+        """Return the stored {product_id: quantity} items"""
+
+    @abstractmethod
+    def persist(self, response):
+        """Write changed items back to the store"""
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __contains__(self, product_id):
+        return str(product_id) in self.items
+
+    def quantity(self, product_id):
+        return self.items.get(str(product_id), 0)
+
+    def add(self, product_id, quantity=1):
+        """Add to a product's quantity; False when the cart is full"""
+        key = str(product_id)
+        if key not in self.items and len(self.items) >= MAX_LINES:
+            return False
+        self.items[key] = self.items.get(key, 0) + quantity
+        self._changed()
+        return True
+
+    def set(self, product_id, quantity):
+        self.items[str(product_id)] = quantity
+        self._changed()
+
+    def remove(self, product_id):
+        if self.items.pop(str(product_id), None) is not None:
+            self._changed()
+
+    def clear(self):
+        self.items = {}
+        self._changed()
+
+    def _changed(self):
+        self.modified = True
+        self._lines = None
+
+    def lines(self):
+        """CartLines for products that still exist, fetched with one query"""
+        if self._lines is None:
+            products = Product.objects.in_bulk([int(pk) for pk in self.items])
+            self._lines = [
+                CartLine(products[int(pk)], quantity)
+                for pk, quantity in self.items.items()
+                if int(pk) in products
+            ]
+        return self._lines
+
+    @property
+    def total_items(self):
+        return sum(line.quantity for line in self.lines())
+
+    @property
+    def total_amount(self):
+        return sum(line.subtotal for line in self.lines())
+
+
+class SessionCart(StoredCart):
+    """Cart held in a logged-in customer's session"""
+
+    def load(self):
+        items = self.request.session.get(SESSION_KEY)
+        if items is None:
+            # Session started without merge_at_login; read the stored cart
+            # but leave the session untouched until the cart changes
+            return load_db_items(self.request.user)
+        return _clean(items)
+
+    def persist(self, response):
+        if self.modified:
+            self.request.session[SESSION_KEY] = self.items
+
+
+class CookieCart(StoredCart):
+    """Cart held in a signed cookie, for visitors without a session"""
+
+    def load(self):
+        value = self.request.get_signed_cookie(
+            COOKIE_NAME, default=None, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE,
+        )
+        if value is None:
+            return {}
+        try:
+            return _clean(json.loads(value))
+        except ValueError:
+            return {}
+
+    def persist(self, response):
+        if not self.modified:
+            return
+        if self.items:
+            response.set_signed_cookie(
+                COOKIE_NAME, json.dumps(self.items, separators=(',', ':')),
+                salt=COOKIE_SALT,
+                max_age=COOKIE_MAX_AGE,
+                httponly=True,
+                samesite='Lax',
+            )
+        else:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+
+
+def get_cart(request):
+    if request.user.is_authenticated:
+        return SessionCart(request)
+    return CookieCart(request)
+
+
+def load_db_items(user):
+    return {
+        str(product_id): quantity
+        for product_id, quantity in CartItem.objects.filter(cart__user=user).values_list('product_id', 'quantity')
+    }
+
+
+def save_to_db(user, items):
+    """Make the user's database cart hold exactly `items`"""
+    products = Product.objects.filter(pk__in=[int(pk) for pk in items]).values_list('pk', flat=True)
+    wanted = {pk: items[str(pk)] for pk in products}
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        if not created:
+            # updated_at is what sweep_carts measures idleness by
+            cart.save(update_fields=['updated_at'])
+        cart.items.exclude(product_id__in=wanted).delete()
+        # One INSERT ... ON CONFLICT (cart, product) DO UPDATE for every line;
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in wanted.items()],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=['quantity'],
+        )
+    return cart
+
+
+def merge_at_login(request, response):
+    """
+    Fold the visitor's cookie cart into their stored cart after login() and
+    load the result into the new session. The database is only written when
+    the cookie held something.
+    """
+    anonymous = CookieCart(request)
+    items = load_db_items(request.user)
+    if anonymous:
+        for pk, quantity in anonymous.items.items():
+            items[pk] = items.get(pk, 0) + quantity
+        save_to_db(request.user, items)
+        anonymous.clear()
+        anonymous.persist(response)
+    request.session[SESSION_KEY] = items
+
+
+def save_at_logout(request):
+    """Write the session cart back before logout() discards the session"""
+    items = request.session.get(SESSION_KEY)
+    if items is not None:
+        save_to_db(request.user, _clean(items))
+
+
+def delete_idle_carts(cutoff, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Delete one batch of stored carts last written before `cutoff`, oldest
+    first. Returns the number of carts and cart items deleted.
+    """
+    # updated_at is indexed, so each batch is a short range scan
+    pks = list(
+        Cart.objects.filter(updated_at__lt=cutoff)
+        .order_by('updated_at')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not pks:
+        return 0, 0
+    _, deleted = Cart.objects.filter(pk__in=pks).delete()
+    return deleted.get('core.Cart', 0), deleted.get('core.CartItem', 0)
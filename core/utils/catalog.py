@@ -0,0 +1,82 @@
+"""
+Cached catalog data and dashboard KPIs
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+
+from core.models import User, Product, Category, Order
+from core.routers import primary_reads
+from .generations import CATEGORY, STOCK, get_generation
+
+FEATURED_LIMIT = 8
+CATALOG_TIMEOUT = 60 * 60
+# Without a shared cache a generation bump never reaches the other workers,
+# so their catalog copies may only lag by this much
+LOCAL_CATALOG_TIMEOUT = 30
+# Order and user counts have no generation counter; keep them briefly
+KPI_TIMEOUT = 60
+
+
+def _cached(key, timeout, compute):
+    value = cache.get(key)
+    if value is None:
+        # Keys carry the primary's generation, so fill them from the primary
+        with primary_reads():
+            value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def _catalog_timeout():
+    return CATALOG_TIMEOUT if settings.CACHE_SHARED else LOCAL_CATALOG_TIMEOUT
+
+
+def categories():
+    """All categories, cached until a category changes"""
+    return _cached(
+        f'catalog:categories:{get_generation(CATEGORY)}',
+        _catalog_timeout(),
+        lambda: list(Category.objects.all()),
+    )
+
+
+def featured_products():
+    """In-stock products shown on the home page, cached until stock changes"""
+    return _cached(
+        f'catalog:featured:{get_generation(STOCK)}',
+        _catalog_timeout(),
+        lambda: list(Product.objects.filter(quantity__gt=0).select_related('category')[:FEATURED_LIMIT]),
+    )
+
+
+def compute_kpis():
+    products = Product.objects.aggregate(
+        total_products=Count('id'),
+        low_stock_count=Count('id', filter=Q(quantity__lte=F('low_stock_threshold'))),
+        out_of_stock_count=Count('id', filter=Q(quantity=0)),
+    )
+    orders = Order.objects.aggregate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(order_status='PENDING')),
+        total_revenue=Sum('total_amount', filter=Q(payment_status='SUCCESS')),
+    )
+    orders['total_revenue'] = orders['total_revenue'] or 0
+    return {**products, **orders, 'total_users': User.objects.count()}
+
+
+def _kpi_key():
+    return f'kpis:{get_generation(STOCK)}'
+
+
+def dashboard_kpis():
+    """Headline figures shared by the manager and admin dashboards"""
+    return _cached(_kpi_key(), KPI_TIMEOUT, compute_kpis)
+
+
+def refresh_kpis():
+    """Recompute the dashboard KPIs now, e.g. after an order was placed"""
+    with primary_reads():
+        kpis = compute_kpis()
+    cache.set(_kpi_key(), kpis, KPI_TIMEOUT)
+    return kpis
@@ -0,0 +1,81 @@
+"""
+Helpers for conditional GET (ETag / Last-Modified) on catalog pages
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .generations import CATEGORY, get_generation
+
+
+def page_etag(request, *parts):
+    """
+    Build an ETag for a page from the given content version parts.
+
+    The visitor and the category generation are always mixed in, since
+    the navbar and category names are part of every catalog page. No ETag
+    is produced while flash messages are pending so they are not swallowed
+    by a 304.
+    """
+    if len(get_messages(request)):
+        return None
+    user_id = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = ':'.join(str(part) for part in (*parts, user_id, get_generation(CATEGORY)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Return a 304 response if the client's validators still match, else None.
+
+    For views that cannot use condition(), e.g. async views whose ETag
+    needs an awaited query. `last_modified` is a datetime or None.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag else None,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = quote_etag(etag)
+    if last_modified and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def _patch_catalog_headers(response, authenticated):
+    if authenticated:
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE, must_revalidate=True
+        )
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def catalog_cache_control(view_func):
+    """Let browsers and proxies revalidate catalog pages instead of refetching them"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            user = await request.auser()
+            return _patch_catalog_headers(response, user.is_authenticated)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        return _patch_catalog_headers(response, request.user.is_authenticated)
+    return wrapper
@@ -0,0 +1,61 @@
+"""
+Cache generation counters used to version cached data
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Bumped whenever product stock, price or categorisation changes
+STOCK = 'stock'
+# Bumped whenever a category is added, edited or removed
+CATEGORY = 'category'
+
+
+def _key(name):
+    return f'generation:{name}'
+
+
+def _seed():
+    # Seed from the clock so a counter evicted from the cache never
+    # restarts at a value that was already used for cached entries.
+    return int(time.time() * 1000)
+
+
+def get_generation(name):
+    """Return the current value of a generation counter"""
+    key = _key(name)
+    value = cache.get(key)
+    if value is None:
+        value = _seed()
+        if not cache.add(key, value, timeout=None):
+            value = cache.get(key, value)
+    return value
+
+
+def generation_key(*names):
+    """Join the current values of several counters into one cache key part"""
+    values = cache.get_many([_key(name) for name in names])
+    return ':'.join(
+        str(values.get(_key(name)) or get_generation(name)) for name in names
+    )
+
+
+def bump_generation(*names):
+    """Invalidate everything cached under the given generation counters"""
+    for name in names:
+        key = _key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), timeout=None)
+
+
+def bump_generation_on_commit(*names):
+    """
+    Bump once the current transaction commits, or now outside one.
+
+    Bumping before commit lets a concurrent reader cache the old rows
+    under the new generation, where they would stay until the next bump.
+    """
+    transaction.on_commit(lambda: bump_generation(*names))
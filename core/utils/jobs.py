@@ -0,0 +1,167 @@
+"""
+Durable job queue backed by the core_job table
+
+Jobs are enqueued inside the caller's transaction, so they exist exactly
+when the work that produced them committed. The run_jobs command claims
+due jobs in batches and retries failures with exponential backoff.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry; doubles with every failed attempt
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 60 * 60
+# A RUNNING job older than this belongs to a worker that died
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+_handlers = {}
+# kind -> interval for jobs run_jobs schedules on its own
+_periodic = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of `kind`; it receives the payload"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def periodic(kind, every):
+    """Register a handler like @handler that also runs roughly once per `every`"""
+    def decorator(func):
+        _periodic[kind] = every
+        return handler(kind)(func)
+    return decorator
+
+
+def schedule_periodic():
+    """Queue the next run of each periodic job that has none waiting"""
+    return sum(1 for kind, every in _periodic.items() if enqueue_unique(kind, delay=every))
+
+
+def enqueue(kind, payload=None, delay=None, max_attempts=5):
+    return enqueue_many([(kind, payload)], delay=delay, max_attempts=max_attempts)[0]
+
+
+def enqueue_many(jobs, delay=None, max_attempts=5):
+    """Insert (kind, payload) pairs in one query"""
+    run_after = timezone.now() + (delay or timedelta())
+    return Job.objects.bulk_create([
+        Job(kind=kind, payload=payload or {}, run_after=run_after, max_attempts=max_attempts)
+        for kind, payload in jobs
+    ])
+
+
+def enqueue_unique(kind, payload=None, delay=None):
+    """
+    Enqueue unless an identical job is already waiting.
+
+    Used for batch jobs that drain a backlog: one pending job is enough no
+    matter how many producers ask for it. A race can add a second one,
+    which then finds nothing to do.
+    """
+    payload = payload or {}
+    if Job.objects.filter(kind=kind, status='PENDING', payload=payload).exists():
+        return None
+    return enqueue(kind, payload, delay=delay)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale():
+    """Return jobs stuck in RUNNING by a crashed worker to the queue"""
+    return Job.objects.filter(
+        status='RUNNING', locked_at__lt=timezone.now() - LOCK_TIMEOUT,
+    ).update(status='PENDING', locked_by='', locked_at=None, updated_at=timezone.now())
+
+
+def purge_done(older_than=timedelta(days=7)):
+    """Delete finished jobs; failed ones are kept for inspection"""
+    deleted, _ = Job.objects.filter(status='DONE', updated_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+def claim_batch(worker, batch_size):
+    """
+    Mark up to batch_size due jobs as RUNNING for this worker and return them.
+
+    SKIP LOCKED lets several workers poll MySQL without contending; SQLite
+    serializes writers, and the status filter on the UPDATE makes a job
+    claimed by another worker in between drop out of this batch.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = Job.objects.filter(status='PENDING', run_after__lte=now).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status='PENDING').update(
+            status='RUNNING', locked_by=worker, locked_at=now, updated_at=now,
+        )
+    return list(Job.objects.filter(pk__in=ids, status='RUNNING', locked_by=worker))
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def run_batch(worker=None, batch_size=50):
+    """
+    Claim and run one batch. Returns (succeeded, failed) counts.
+
+    Each job runs in its own transaction so a failure only rolls back that
+    job; successes are marked DONE together with a single UPDATE.
+    """
+    worker = worker or worker_id()
+    done, failed = [], []
+    for job in claim_batch(worker, batch_size):
+        func = _handlers.get(job.kind)
+        job.attempts += 1
+        try:
+            if func is None:
+                raise LookupError(f'No handler registered for {job.kind!r}')
+            with transaction.atomic():
+                func(job.payload)
+        except Exception:
+            job.last_error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                job.status = 'FAILED'
+                logger.error('Job %s failed permanently after %s attempts', job, job.attempts)
+            else:
+                job.status = 'PENDING'
+                job.run_after = timezone.now() + _retry_delay(job.attempts)
+                logger.warning('Job %s failed (attempt %s), retrying', job, job.attempts)
+            job.locked_by, job.locked_at = '', None
+            failed.append(job)
+        else:
+            done.append(job.pk)
+
+    now = timezone.now()
+    if done:
+        Job.objects.filter(pk__in=done).update(
+            status='DONE', attempts=F('attempts') + 1, locked_by='', locked_at=None, updated_at=now,
+        )
+    if failed:
+        for job in failed:
+            job.updated_at = now
+        Job.objects.bulk_update(
+            failed,
+            ['status', 'attempts', 'run_after', 'last_error', 'locked_by', 'locked_at', 'updated_at'],
+        )
+    return len(done), len(failed)
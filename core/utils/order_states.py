@@ -0,0 +1,102 @@
+"""
+Order status state machine
+
+Every status change goes through transition() or bulk_transition(), which
+reject moves the table below does not allow and record each change in
+OrderStatusChange.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Order, OrderStatusChange
+
+TRANSITIONS = {
+    'PENDING': {'CONFIRMED', 'CANCELLED'},
+    'CONFIRMED': {'PROCESSING', 'SHIPPED', 'CANCELLED'},
+    'PROCESSING': {'SHIPPED', 'CANCELLED'},
+    'SHIPPED': {'DELIVERED'},
+    'DELIVERED': set(),
+    'CANCELLED': set(),
+}
+
+# Bulk action name -> target status
+ACTIONS = {
+    'confirm': 'CONFIRMED',
+    'process': 'PROCESSING',
+    'ship': 'SHIPPED',
+    'deliver': 'DELIVERED',
+    'cancel': 'CANCELLED',
+}
+
+
+class InvalidTransition(Exception):
+    """Raised when an order cannot move to the requested status"""
+
+
+class ConcurrentUpdate(Exception):
+    """Raised when orders changed status between selection and update"""
+
+
+def sources_for(target):
+    """Statuses an order may be in to move to `target`"""
+    return sorted(status for status, targets in TRANSITIONS.items() if target in targets)
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def audit_entries(changes, user=None, note=''):
+    """OrderStatusChange rows for (order_pk, from_status, to_status) triples"""
+    return [
+        OrderStatusChange(order_id=pk, from_status=old, to_status=new, changed_by=user, note=note)
+        for pk, old, new in changes
+    ]
+
+
+def transition(order, target, user=None, note=''):
+    """Move one order to `target`, or raise InvalidTransition"""
+    if not can_transition(order.order_status, target):
+        raise InvalidTransition(f"Order {order.order_id} cannot go from {order.order_status} to {target}")
+    now = timezone.now()
+    with transaction.atomic():
+        # Guarded on the status we validated, in case it changed meanwhile
+        updated = Order.objects.filter(pk=order.pk, order_status=order.order_status).update(
+            order_status=target, updated_at=now,
+        )
+        if not updated:
+            raise ConcurrentUpdate(f"Order {order.order_id} changed status; reload and try again")
+        OrderStatusChange.objects.bulk_create(
+            audit_entries([(order.pk, order.order_status, target)], user, note)
+        )
+    order.order_status, order.updated_at = target, now
+    return order
+
+
+def bulk_transition(orders, target, user=None, note=''):
+    """
+    Move every order in the `orders` queryset that may go to `target`.
+
+    Orders in other statuses are skipped. The status change is a single
+    filtered UPDATE and the audit trail a single bulk_create. Returns the
+    number of orders moved.
+    """
+    if target not in TRANSITIONS:
+        raise InvalidTransition(f"Unknown status {target}")
+    eligible = orders.filter(order_status__in=sources_for(target))
+
+    with transaction.atomic():
+        # Lock the rows where the backend can, so the UPDATE matches what
+        # the audit records; SQLite instead fails a stale write transaction
+        snapshot = eligible.order_by()
+        if connection.features.has_select_for_update:
+            snapshot = snapshot.select_for_update()
+        changes = [(pk, status, target) for pk, status in snapshot.values_list('pk', 'order_status')]
+        if not changes:
+            return 0
+
+        updated = eligible.update(order_status=target, updated_at=timezone.now())
+        if updated != len(changes):
+            raise ConcurrentUpdate("Orders changed status during the update; nothing was applied")
+        OrderStatusChange.objects.bulk_create(audit_entries(changes, user, note), batch_size=1000)
+    return updated
@@ -0,0 +1,69 @@
+"""
+Cached per-customer order summary
+
+Computed from the database and cached under a per-customer generation.
+Checkout, payment outcomes and deletions bump that generation once they
+commit, so a summary computed from older rows is never read again, even
+when it is written back after the bump.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from core.models import Order
+from .generations import bump_generation_on_commit, get_generation
+
+SUMMARY_TIMEOUT = 60 * 60 * 24
+# Without a shared cache the other workers never see the bump
+LOCAL_SUMMARY_TIMEOUT = 60
+
+
+def summary_generation(user_id):
+    """Generation name bumped whenever the customer's orders change"""
+    return f'order_summary:{user_id}'
+
+
+def _key(user_id):
+    return f'order_summary:{user_id}:{get_generation(summary_generation(user_id))}'
+
+
+def _last_order(order):
+    return {
+        'order_id': order.order_id,
+        'total_amount': order.total_amount,
+        'created_at': order.created_at,
+    }
+
+
+def compute_summary(user_id):
+    orders = Order.objects.filter(user_id=user_id)
+    totals = orders.aggregate(
+        order_count=Count('id'),
+        # Same definition as revenue on the dashboards
+        lifetime_spend=Sum('total_amount', filter=Q(payment_status='SUCCESS')),
+    )
+    last = orders.order_by('-created_at').only('order_id', 'total_amount', 'created_at').first()
+    return {
+        'order_count': totals['order_count'],
+        'lifetime_spend': totals['lifetime_spend'] or 0,
+        'last_order': _last_order(last) if last else None,
+    }
+
+
+def order_summary(user):
+    """Lifetime spend, order count and last order for a customer"""
+    key = _key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_summary(user.pk)
+        cache.set(key, summary, SUMMARY_TIMEOUT if settings.CACHE_SHARED else LOCAL_SUMMARY_TIMEOUT)
+    return summary
+
+
+def record_order(order):
+    """Retire the customer's cached summary once the new order commits"""
+    invalidate_summaries([order.user_id])
+
+
+def invalidate_summaries(user_ids):
+    bump_generation_on_commit(*{summary_generation(user_id) for user_id in user_ids})
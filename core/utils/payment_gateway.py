@@ -0,0 +1,108 @@
+"""
+Payment gateway clients
+
+PAYMENT_GATEWAY selects Razorpay (default) or the local stand-in, which
+keeps orders and payments in memory and signs callbacks and webhooks the
+way Razorpay does, for tests and offline development.
+"""
+import json
+import uuid
+
+from django.conf import settings
+
+from .payments import sign
+
+
+class RazorpayGateway:
+    """Thin wrapper over the razorpay client"""
+
+    def __init__(self, key_id, key_secret):
+        import razorpay
+        self.client = razorpay.Client(auth=(key_id, key_secret))
+
+    def create_order(self, amount_paise, receipt):
+        return self.client.order.create({'amount': amount_paise, 'currency': 'INR', 'receipt': receipt})
+
+    def order_payments(self, razorpay_order_id):
+        return self.client.order.payments(razorpay_order_id).get('items', [])
+
+
+class LocalGateway:
+    """In-process stand-in for Razorpay"""
+
+    def __init__(self):
+        self.orders = {}
+        self.payments = {}
+
+    @property
+    def key_secret(self):
+        return settings.RAZORPAY_KEY_SECRET
+
+    @property
+    def webhook_secret(self):
+        return settings.RAZORPAY_WEBHOOK_SECRET
+
+    def create_order(self, amount_paise, receipt):
+        order = {
+            'id': f'order_{uuid.uuid4().hex[:14]}',
+            'amount': amount_paise,
+            'currency': 'INR',
+            'receipt': receipt,
+            'status': 'created',
+        }
+        self.orders[order['id']] = order
+        return order
+
+    def order_payments(self, razorpay_order_id):
+        return [p for p in self.payments.values() if p['order_id'] == razorpay_order_id]
+
+    def pay(self, razorpay_order_id, succeed=True):
+        """Record a payment attempt against an order and return it"""
+        order = self.orders[razorpay_order_id]
+        payment = {
+            'id': f'pay_{uuid.uuid4().hex[:14]}',
+            'order_id': razorpay_order_id,
+            'amount': order['amount'],
+            'currency': 'INR',
+            'status': 'captured' if succeed else 'failed',
+        }
+        self.payments[payment['id']] = payment
+        if succeed:
+            order['status'] = 'paid'
+        return payment
+
+    def checkout_callback(self, payment):
+        """The fields checkout.js posts to payment_callback"""
+        return {
+            'razorpay_payment_id': payment['id'],
+            'razorpay_order_id': payment['order_id'],
+            'razorpay_signature': sign(f"{payment['order_id']}|{payment['id']}", self.key_secret),
+        }
+
+    def webhook(self, payment):
+        """A (body, X-Razorpay-Signature) pair for the payment's webhook"""
+        event = 'payment.captured' if payment['status'] == 'captured' else 'payment.failed'
+        body = json.dumps({
+            'event': event,
+            'payload': {'payment': {'entity': payment}},
+        }).encode()
+        return body, sign(body, self.webhook_secret)
+
+
+_local_gateway = None
+
+
+def get_gateway():
+    """The configured gateway, or None when Razorpay is not set up"""
+    global _local_gateway
+    if settings.PAYMENT_GATEWAY == 'local':
+        if _local_gateway is None:
+            _local_gateway = LocalGateway()
+        return _local_gateway
+
+    if not (settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET):
+        return None
+    try:
+        return RazorpayGateway(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+    except ImportError:
+        return None
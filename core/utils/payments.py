@@ -0,0 +1,152 @@
+"""
+Payment callback ingestion and batched order updates
+
+Callbacks, webhooks and reconciled payments are only verified and appended
+to the PaymentEvent inbox while the gateway waits; the payments.process job
+applies them to orders in batches. The unique razorpay_payment_id makes redeliveries
+no-ops.
+"""
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Order, PaymentEvent
+from . import catalog
+from .jobs import enqueue_unique
+from .order_states import bulk_transition
+from .order_summary import invalidate_summaries
+
+# Razorpay payment states that mean the order is paid
+PAID_STATUSES = {'captured', 'authorized'}
+SETTLED_STATUSES = PAID_STATUSES | {'failed'}
+WEBHOOK_EVENTS = {'payment.authorized', 'payment.captured', 'payment.failed'}
+# Let a burst of webhooks accumulate before the batch runs
+PROCESS_DELAY = timedelta(seconds=2)
+BATCH_SIZE = 500
+
+
+class PaymentError(Exception):
+    """Raised for a callback that is malformed or fails verification"""
+
+
+def sign(message, secret):
+    if isinstance(message, str):
+        message = message.encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _check_signature(message, signature, secret):
+    if not secret:
+        raise PaymentError("Payment verification is not configured")
+    if not signature or not hmac.compare_digest(sign(message, secret), signature):
+        raise PaymentError("Invalid payment signature")
+
+
+def verify_callback(data):
+    """Build an inbox event from the checkout handler's POST"""
+    try:
+        payment_id = data['razorpay_payment_id']
+        order_id = data['razorpay_order_id']
+        signature = data['razorpay_signature']
+    except KeyError as exc:
+        raise PaymentError(f"Missing {exc.args[0]}")
+    _check_signature(f"{order_id}|{payment_id}", signature, settings.RAZORPAY_KEY_SECRET)
+    return PaymentEvent(
+        razorpay_payment_id=payment_id,
+        razorpay_order_id=order_id,
+        razorpay_signature=signature,
+        status='captured',
+        source='CALLBACK',
+    )
+
+
+def verify_webhook(body, signature):
+    """Build inbox events from a webhook body; unrelated events yield none"""
+    _check_signature(body, signature, settings.RAZORPAY_WEBHOOK_SECRET)
+    try:
+        data = json.loads(body)
+        if data.get('event') not in WEBHOOK_EVENTS:
+            return []
+        payment = data['payload']['payment']['entity']
+        return [PaymentEvent(
+            razorpay_payment_id=payment['id'],
+            razorpay_order_id=payment['order_id'],
+            status=payment['status'],
+            source='WEBHOOK',
+            payload=payment,
+        )]
+    except (ValueError, KeyError, TypeError):
+        raise PaymentError("Malformed webhook payload")
+
+
+def ingest(events):
+    """Append events to the inbox, skipping payments already received"""
+    if not events:
+        return
+    with transaction.atomic():
+        PaymentEvent.objects.bulk_create(events, ignore_conflicts=True)
+        enqueue_unique('payments.process', delay=PROCESS_DELAY)
+
+
+def process_inbox(batch_size=BATCH_SIZE):
+    """
+    Apply one batch of unprocessed events to their orders. Returns the
+    number of events handled.
+
+    Orders are loaded with one query and their payment fields written with
+    one bulk_update. Paid PENDING orders are confirmed through
+    bulk_transition, a filtered UPDATE, so a status staff changed meanwhile
+    is never overwritten. A paid order is never moved back to FAILED by a
+    later failed attempt.
+    """
+    with transaction.atomic():
+        pending = PaymentEvent.objects.filter(processed_at__isnull=True).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        events = list(pending[:batch_size])
+        if not events:
+            return 0
+
+        orders = Order.objects.filter(razorpay_order_id__in={e.razorpay_order_id for e in events})
+        if connection.features.has_select_for_update:
+            orders = orders.select_for_update()
+        orders = {order.razorpay_order_id: order for order in orders}
+        now = timezone.now()
+        changed = {}
+        for event in events:
+            event.processed_at = now
+            order = orders.get(event.razorpay_order_id)
+            if order is None:
+                event.error = "Unknown order"
+                continue
+            if order.payment_status == 'SUCCESS':
+                continue
+            if event.status in PAID_STATUSES:
+                order.payment_status = 'SUCCESS'
+                order.razorpay_payment_id = event.razorpay_payment_id
+                order.razorpay_signature = event.razorpay_signature or order.razorpay_signature
+            else:
+                order.payment_status = 'FAILED'
+            order.updated_at = now
+            changed[order.pk] = order
+
+        if changed:
+            Order.objects.bulk_update(
+                changed.values(),
+                ['payment_status', 'razorpay_payment_id', 'razorpay_signature', 'updated_at'],
+            )
+            paid = [order.pk for order in changed.values() if order.payment_status == 'SUCCESS']
+            if paid:
+                bulk_transition(Order.objects.filter(pk__in=paid), 'CONFIRMED', note="Payment received")
+        PaymentEvent.objects.bulk_update(events, ['processed_at', 'error'])
+
+    if changed:
+        # Revenue on the dashboards and customer spend count paid orders
+        catalog.refresh_kpis()
+        invalidate_summaries(order.user_id for order in changed.values())
+    return len(events)
@@ -0,0 +1,109 @@
+"""
+In-process request performance statistics
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+# Upper bounds (ms) of the wall-time histogram buckets
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Stats for the request currently being handled by this thread/task
+current_request = ContextVar('current_request_stats', default=None)
+
+
+class RequestStats:
+    """Timings collected while a single request is processed"""
+
+    __slots__ = ('query_count', 'db_ms', 'template_ms')
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+
+
+def query_timer(execute, sql, params, many, context):
+    """Execute wrapper adding query count and time to the current request"""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.query_count += 1
+        stats.db_ms += (time.perf_counter() - start) * 1000
+
+
+def install(sender, connection, **kwargs):
+    """
+    connection_created handler attaching query_timer.
+
+    Installed per connection rather than per request so that queries run
+    by the async ORM, which executes on a worker thread with its own
+    connection, are still attributed through the context variable.
+    """
+    if query_timer not in connection.execute_wrappers:
+        # Innermost position: execute_wrapper() context managers pop from the end
+        connection.execute_wrappers.insert(0, query_timer)
+
+
+class ViewStats:
+    """Aggregated timings for a single view"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.template_ms = 0.0
+        self.bytes = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, wall_ms, stats, size):
+        self.count += 1
+        self.total_ms += wall_ms
+        self.max_ms = max(self.max_ms, wall_ms)
+        self.db_ms += stats.db_ms
+        self.queries += stats.query_count
+        self.template_ms += stats.template_ms
+        self.bytes += size
+        self.buckets[bisect.bisect_left(BUCKETS_MS, wall_ms)] += 1
+
+    def as_dict(self):
+        count = self.count or 1
+        labels = [f'le_{bound}' for bound in BUCKETS_MS] + ['inf']
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / count, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_db_ms': round(self.db_ms / count, 2),
+            'avg_queries': round(self.queries / count, 2),
+            'avg_template_ms': round(self.template_ms / count, 2),
+            'avg_bytes': self.bytes // count,
+            'histogram': dict(zip(labels, self.buckets)),
+        }
+
+
+_lock = threading.Lock()
+_views = {}
+
+
+def record(view_name, wall_ms, stats, size):
+    with _lock:
+        _views.setdefault(view_name, ViewStats()).add(wall_ms, stats, size)
+
+
+def snapshot():
+    """Return aggregated stats per view, slowest average first"""
+    with _lock:
+        data = {name: view.as_dict() for name, view in _views.items()}
+    return dict(sorted(data.items(), key=lambda item: item[1]['avg_ms'], reverse=True))
+
+
+def reset():
+    with _lock:
+        _views.clear()
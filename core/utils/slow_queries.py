@@ -0,0 +1,160 @@
+"""
+Slow query log with originating frame, SQL fingerprint and EXPLAIN plan
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger('core.slow_queries')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+_CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_VIEW_FILES = {os.path.join(_CORE_DIR, name) for name in ('views.py', 'async_views.py')}
+_SKIPPED_FILES = {__file__, os.path.join(_CORE_DIR, 'middleware.py')}
+
+_local = threading.local()
+_handler_lock = threading.Lock()
+_handler_path = None
+
+
+def fingerprint(sql):
+    """Normalize SQL so queries differing only in literals group together"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint_id(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _origin():
+    """Return the core/views.py frame (or failing that any core frame) issuing the query"""
+    fallback = None
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename in _VIEW_FILES:
+            return _format_frame(frame)
+        if (fallback is None and frame.filename.startswith(_CORE_DIR)
+                and frame.filename not in _SKIPPED_FILES
+                and os.sep + 'utils' + os.sep not in frame.filename):
+            fallback = frame
+    return _format_frame(fallback) if fallback else None
+
+
+def _format_frame(frame):
+    path = os.path.relpath(frame.filename, os.path.dirname(_CORE_DIR))
+    return f'{path}:{frame.lineno} in {frame.name}'
+
+
+def _explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' | '.join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+
+
+def _get_logger():
+    global _handler_path
+    path = str(settings.SLOW_QUERY_LOG)
+    if _handler_path != path:
+        with _handler_lock:
+            if _handler_path != path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    handler.close()
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                _handler_path = path
+    return logger
+
+
+def log_slow_query(connection, sql, params, many, duration_ms):
+    normalized = fingerprint(sql)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'database': connection.alias,
+        'duration_ms': round(duration_ms, 2),
+        'fingerprint': fingerprint_id(normalized),
+        'normalized_sql': normalized,
+        'sql': sql,
+        'origin': _origin(),
+        'explain': None if many else _explain(connection, sql, params),
+    }
+    _get_logger().info(json.dumps(entry, default=str))
+
+
+class SlowQueryLogger:
+    """Execute wrapper logging queries slower than SLOW_QUERY_THRESHOLD_MS"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'active', False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                _local.active = True
+                try:
+                    log_slow_query(self.connection, sql, params, many, duration_ms)
+                except Exception:
+                    logging.getLogger(__name__).exception('Could not log slow query')
+                finally:
+                    _local.active = False
+
+
+def install(sender, connection, **kwargs):
+    """connection_created handler attaching the slow query logger"""
+    if settings.SLOW_QUERY_THRESHOLD_MS < 0:
+        return
+    if not any(isinstance(w, SlowQueryLogger) for w in connection.execute_wrappers):
+        # Innermost position: execute_wrapper() context managers pop from the end
+        connection.execute_wrappers.insert(0, SlowQueryLogger(connection))
+
+
+def read_entries(path):
+    """Yield logged entries from the log file and its rotated backups, oldest first"""
+    paths = [f'{path}.{n}' for n in range(settings.SLOW_QUERY_LOG_BACKUP_COUNT, 0, -1)] + [str(path)]
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path) as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,91 @@
+"""
+In-process pub/sub for live stock level changes
+
+Subscribers are asyncio queues owned by SSE connections; publishers are
+ordinary (sync) request handlers. Events only reach subscribers in the
+same process, so run the stream and the writes under the same ASGI
+server when using it.
+"""
+import asyncio
+import threading
+import time
+
+# Subscribers registered for every product (e.g. the staff dashboard)
+ALL_PRODUCTS = None
+
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One SSE client's queue and the product ids it listens to"""
+
+    def __init__(self, product_ids):
+        self.product_ids = frozenset(product_ids) if product_ids else ALL_PRODUCTS
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client only needs the latest level; drop the oldest
+            self.queue.get_nowait()
+            self.queue.put_nowait(event)
+
+
+class StockBroker:
+    """Fans quantity changes out to the subscribers of each product"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_product = {}
+        self._all = set()
+
+    def subscribe(self, product_ids=None):
+        subscription = Subscription(product_ids)
+        with self._lock:
+            if subscription.product_ids is ALL_PRODUCTS:
+                self._all.add(subscription)
+            else:
+                for product_id in subscription.product_ids:
+                    self._by_product.setdefault(product_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.product_ids is ALL_PRODUCTS:
+                self._all.discard(subscription)
+                return
+            for product_id in subscription.product_ids:
+                subscribers = self._by_product.get(product_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_product[product_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._all) + len({s for subs in self._by_product.values() for s in subs})
+
+    def publish(self, product_id, quantity, low_stock_threshold=None):
+        """Thread-safe; callable from sync views and worker threads"""
+        with self._lock:
+            targets = list(self._all) + list(self._by_product.get(product_id, ()))
+        if not targets:
+            return 0
+        event = {
+            'product': product_id,
+            'quantity': quantity,
+            'low_stock': low_stock_threshold is not None and quantity <= low_stock_threshold,
+            'at': time.time(),
+        }
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+        return len(targets)
+
+
+broker = StockBroker()
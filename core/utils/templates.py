@@ -0,0 +1,50 @@
+"""
+Template precompilation helpers
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.template import engines
+
+logger = logging.getLogger(__name__)
+
+
+def django_engine():
+    return engines['django'].engine
+
+
+def template_names(directory=None):
+    """Names of every template under core/templates (or `directory`), sorted"""
+    directory = str(directory or os.path.join(apps.get_app_config('core').path, 'templates'))
+    names = []
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith(('.html', '.txt')):
+                path = os.path.join(root, filename)
+                names.append(os.path.relpath(path, directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def precompile_templates(engine=None):
+    """
+    Parse every template once so the cached loader holds compiled copies.
+
+    Meant to run at worker boot; returns {template name: compile ms}.
+    """
+    engine = engine or django_engine()
+    timings = {}
+    start = time.perf_counter()
+    for name in template_names():
+        began = time.perf_counter()
+        try:
+            engine.get_template(name)
+        except Exception:
+            logger.exception('Could not precompile template %s', name)
+            continue
+        timings[name] = (time.perf_counter() - began) * 1000
+    logger.info(
+        'Precompiled %d templates in %.1fms', len(timings), (time.perf_counter() - start) * 1000
+    )
+    return timings
@@ -0,0 +1,63 @@
+"""
+Inventory valuation report computed in the database
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import Product
+from core.routers import primary_reads
+from .generations import STOCK, get_generation
+
+CACHE_TIMEOUT = 60 * 60
+
+STOCK_VALUE = ExpressionWrapper(
+    F('price') * F('quantity'),
+    output_field=DecimalField(max_digits=20, decimal_places=2),
+)
+
+
+def _totals(queryset):
+    return queryset.aggregate(
+        sku_count=Count('id'),
+        units=Coalesce(Sum('quantity'), 0),
+        stock_value=Coalesce(Sum(STOCK_VALUE), Decimal('0.00')),
+    )
+
+
+def _grouped(queryset, *fields):
+    rows = (
+        queryset.values(*fields)
+        .annotate(
+            sku_count=Count('id'),
+            units=Sum('quantity'),
+            stock_value=Sum(STOCK_VALUE),
+        )
+        .order_by('-stock_value', *fields)
+    )
+    return list(rows)
+
+
+def compute_valuation():
+    """Build the valuation report; every figure is aggregated in SQL"""
+    products = Product.objects.all()
+    return {
+        'by_category': _grouped(products, 'category_id', 'category__name'),
+        'by_supplier': _grouped(products, 'supplier'),
+        'by_category_supplier': _grouped(products, 'category__name', 'supplier'),
+        'totals': _totals(products),
+    }
+
+
+def inventory_valuation():
+    """Return the valuation report, cached per stock-change generation"""
+    key = f'inventory_valuation:{get_generation(STOCK)}'
+    report = cache.get(key)
+    if report is None:
+        # Keyed by the primary's generation, so never filled from the replica
+        with primary_reads():
+            report = compute_valuation()
+        cache.set(key, report, CACHE_TIMEOUT)
+    return report
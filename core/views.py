@@ -2,45 +2,67 @@
 Stable Views for Supermart Application
 """
 
+import csv
 import json
 import uuid
 import logging
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Sum, Q, F
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse, HttpResponse
+from django.db import transaction
+from django.db.models import Count, Max, Q, F
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
 
 from .models import (
     User, Product, Category,
-    Cart, CartItem, Order, OrderItem,
+    Cart, Order, OrderItem,
     StockEntry
 )
 from .forms import (
     UserRegistrationForm,
     UserLoginForm,
-    CheckoutForm
+    CheckoutForm,
+    ProductBulkUpdateForm
 )
 from .decorators import (
     admin_required,
     manager_required,
     staff_required,
-    customer_required
+    customer_required,
+    read_replica
 )
+from .jobs import enqueue_order_jobs
+from .utils import cart_store, catalog, perf
+from .utils.api import APIError, api_etag, error_response, keyset_page, parse_fields
+from .utils.conditional import catalog_cache_control, page_etag
+from .utils.generations import CATEGORY, STOCK
+from .utils.bulk_update import apply_product_updates, parse_csv
+from .utils.order_states import (
+    ACTIONS as ORDER_ACTIONS,
+    TRANSITIONS,
+    ConcurrentUpdate,
+    InvalidTransition,
+    bulk_transition,
+    can_transition,
+    transition
+)
+from .utils.order_summary import order_summary, record_order
+from .utils.payments import PaymentError, ingest, verify_callback, verify_webhook
+from .utils.valuation import inventory_valuation
 
 logger = logging.getLogger(__name__)
 
 # ================= HOME =================
 
 def home(request):
-    featured_products = Product.objects.filter(quantity__gt=0)[:8]
-    categories = Category.objects.all()
-
     return render(request, "home.html", {
-        "featured_products": featured_products,
-        "categories": categories,
+        "featured_products": catalog.featured_products(),
+        "categories": catalog.categories(),
     })
 
 
@@ -71,24 +93,22 @@ def user_login(request):
         email = form.cleaned_data["email"]
         password = form.cleaned_data["password"]
 
-        # Try to find user by email first
-        try:
-            user_obj = User.objects.get(email__iexact=email)
-            user = authenticate(request, username=user_obj.username, password=password)
-        except User.DoesNotExist:
-            user = None
+        user = authenticate(request, email=email, password=password)
 
         if user:
             login(request, user)
 
             if user.role == "ADMIN":
-                return redirect("admin_dashboard")
+                response = redirect("admin_dashboard")
             elif user.role == "MANAGER":
-                return redirect("manager_dashboard")
+                response = redirect("manager_dashboard")
             elif user.role == "STAFF":
-                return redirect("staff_dashboard")
+                response = redirect("staff_dashboard")
             else:
-                return redirect("customer_dashboard")
+                response = redirect("customer_dashboard")
+
+            cart_store.merge_at_login(request, response)
+            return response
 
         messages.error(request, "Invalid email or password.")
 
@@ -96,16 +116,17 @@ def user_login(request):
 
 
 def user_logout(request):
+    if request.user.is_authenticated:
+        cart_store.save_at_logout(request)
     logout(request)
     return redirect("home")
 
 
 # ================= PRODUCTS =================
 
-def products_list(request):
-    logger.debug("Fetching products and categories")
+def _catalog_products(request):
+    """In-stock products filtered by the category/search query parameters"""
     products = Product.objects.filter(quantity__gt=0)
-    categories = Category.objects.all()
 
     category_id = request.GET.get("category")
     search = request.GET.get("search")
@@ -121,112 +142,190 @@ def products_list(request):
             Q(description__icontains=search)
         )
 
-    logger.debug(f"Products count: {products.count()}, Categories count: {categories.count()}")
+    return products
+
+
+def _catalog_etag(request):
+    # No Last-Modified for listings: the newest updated_at in the filtered set
+    # does not move when a product drops out or a category is renamed, which
+    # the count and the category generation in the ETag do catch
+    state = _catalog_products(request).aggregate(
+        last_modified=Max("updated_at"),
+        count=Count("id"),
+    )
+    return page_etag(request, request.get_full_path(), state["last_modified"], state["count"])
+
+
+@catalog_cache_control
+@condition(etag_func=_catalog_etag)
+def products_list(request):
+    logger.debug("Fetching products and categories")
+    products = _catalog_products(request).select_related("category")
+
     return render(request, "products.html", {
         "products": products,
-        "categories": categories,
+        "categories": catalog.categories(),
     })
 
 
+def _product_updated_at(request, pk):
+    if not hasattr(request, "_product_updated_at"):
+        request._product_updated_at = Product.objects.filter(pk=pk).values_list(
+            "updated_at", flat=True
+        ).first()
+    return request._product_updated_at
+
+
+def _product_etag(request, pk):
+    updated_at = _product_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return page_etag(request, "product", pk, updated_at)
+
+
+@catalog_cache_control
+@condition(etag_func=_product_etag, last_modified_func=_product_updated_at)
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(Product.objects.select_related("category"), pk=pk)
     return render(request, "product_detail.html", {"product": product})
 
 
 # ================= CART =================
 
-@login_required
-def add_to_cart(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+def _is_ajax(request):
+    return request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product
-    )
 
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
-
-    return redirect("cart_view")
+def add_to_cart(request, pk):
+    # Anonymous visitors get a cookie cart, merged into theirs at login.
+    # The product read is the only query and doubles as the stock check.
+    product = get_object_or_404(Product.objects.only("name", "quantity"), pk=pk)
+    cart = cart_store.get_cart(request)
+
+    if not product.quantity:
+        added, message = False, f"{product.name} is out of stock."
+    elif cart.quantity(pk) >= product.quantity:
+        added, message = False, f"Only {product.quantity} {product.name} in stock."
+    elif not cart.add(pk):
+        added, message = False, "Your cart is full."
+    else:
+        added, message = True, f"{product.name} added to cart."
+
+    if _is_ajax(request):
+        response = JsonResponse({
+            "success": added,
+            "message": message,
+            "quantity": cart.quantity(pk),
+            "cart_lines": len(cart.items),
+        }, status=200 if added else 409)
+    else:
+        if not added:
+            messages.error(request, message)
+        response = redirect("cart_view")
+    cart.persist(response)
+    return response
 
 
 @login_required
 def cart_view(request):
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    cart = cart_store.get_cart(request)
     return render(request, "cart.html", {"cart": cart})
 
 
 @login_required
 def update_cart_item(request, pk):
-    cart_item = get_object_or_404(
-        CartItem,
-        pk=pk,
-        cart__user=request.user
-    )
+    cart = cart_store.get_cart(request)
+    if pk not in cart:
+        raise Http404("Product is not in the cart")
 
     if request.method == "POST":
+        product = get_object_or_404(Product, pk=pk)
         quantity = int(request.POST.get("quantity", 1))
 
-        if 0 < quantity <= cart_item.product.quantity:
-            cart_item.quantity = quantity
-            cart_item.save()
+        if 0 < quantity <= product.quantity:
+            cart.set(pk, quantity)
             messages.success(request, "Cart updated.")
         else:
             messages.error(request, "Invalid quantity.")
 
-    return redirect("cart_view")
+    response = redirect("cart_view")
+    cart.persist(response)
+    return response
 
 
 @login_required
 def remove_from_cart(request, pk):
-    cart_item = get_object_or_404(
-        CartItem,
-        pk=pk,
-        cart__user=request.user
-    )
-    cart_item.delete()
+    cart = cart_store.get_cart(request)
+    if pk not in cart:
+        raise Http404("Product is not in the cart")
+
+    cart.remove(pk)
     messages.success(request, "Item removed.")
-    return redirect("cart_view")
+    response = redirect("cart_view")
+    cart.persist(response)
+    return response
 
 
 # ================= CHECKOUT =================
 
 @login_required
 def checkout(request):
-    cart = get_object_or_404(Cart, user=request.user)
+    cart = cart_store.get_cart(request)
 
-    if cart.items.count() == 0:
+    if not cart.lines():
         messages.warning(request, "Cart is empty.")
         return redirect("cart_view")
 
     form = CheckoutForm(request.POST or None)
 
     if request.method == "POST" and form.is_valid():
-
-        order = Order.objects.create(
-            order_id=f"ORD{uuid.uuid4().hex[:8].upper()}",
-            user=request.user,
-            total_amount=cart.total_amount,
-            shipping_address=form.cleaned_data["shipping_address"],
-            payment_status="SUCCESS",
-            order_status="CONFIRMED"
-        )
-
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price
+        lines = cart.lines()
+
+        with transaction.atomic():
+            # Re-read stock under lock so concurrent checkouts cannot oversell
+            stock = Product.objects.select_for_update().in_bulk([line.product.pk for line in lines])
+            short = [
+                line.product.name for line in lines
+                if line.product.pk not in stock or stock[line.product.pk].quantity < line.quantity
+            ]
+            if short:
+                messages.error(request, f"Not enough stock for {', '.join(short)}.")
+                return redirect("cart_view")
+
+            order = Order.objects.create(
+                order_id=f"ORD{uuid.uuid4().hex[:8].upper()}",
+                user=request.user,
+                total_amount=cart.total_amount,
+                shipping_address=form.cleaned_data["shipping_address"],
+                payment_status="SUCCESS",
+                order_status="CONFIRMED"
             )
 
-            item.product.quantity -= item.quantity
-            item.product.save()
-
-        cart.delete()
-        return redirect("customer_dashboard")
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=line.product,
+                    quantity=line.quantity,
+                    price=line.product.price
+                )
+                for line in lines
+            ])
+
+            for line in lines:
+                product = stock[line.product.pk]
+                product.quantity -= line.quantity
+                product.save()
+
+            # The session cart is the latest copy; the stored one is spent too
+            Cart.objects.filter(user=request.user).delete()
+            # Rollups, alerts, email and payment reconciliation run in run_jobs
+            enqueue_order_jobs(order)
+            record_order(order)
+
+        cart.clear()
+        response = redirect("customer_dashboard")
+        cart.persist(response)
+        return response
 
     return render(request, "checkout.html", {
         "cart": cart,
@@ -236,69 +335,83 @@ def checkout(request):
 
 # ================= ROLE DASHBOARDS =================
 
-@login_required
+RECENT_ORDERS = 5
+ORDER_HISTORY_PAGE_SIZE = 20
+
+
 @customer_required
 def customer_dashboard(request):
-    orders = Order.objects.filter(user=request.user)
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    summary = order_summary(request.user)
+    cart = cart_store.get_cart(request)
 
-    if not orders.exists() and cart.items.exists():
-        return render(request, "customer/dashboard.html", {"cart": cart})
+    if not summary["order_count"] and cart:
+        return render(request, "customer/dashboard.html", {"cart": cart, "cart_items": cart.lines()})
 
-    return render(request, "customer/dashboard.html", {"orders": orders})
+    recent_orders = Order.objects.filter(user=request.user).order_by("-created_at")[:RECENT_ORDERS]
+    return render(request, "customer/dashboard.html", {
+        "recent_orders": recent_orders,
+        "summary": summary,
+    })
 
 
-@login_required
 @staff_required
+@read_replica
 def staff_dashboard(request):
     low_stock = Product.objects.filter(
         quantity__lte=F("low_stock_threshold")
     )
-    return render(request, "staff/dashboard.html", {"low_stock": low_stock})
+    return render(request, "staff/dashboard.html", {
+        "low_stock": low_stock,
+        "low_stock_products": low_stock,
+    })
 
 
-@login_required
 @manager_required
+@read_replica
 def manager_dashboard(request):
-    total_products = Product.objects.count()
-    low_stock = Product.objects.filter(quantity__lte=F('low_stock_threshold'))
-    pending_orders = Order.objects.filter(order_status='PENDING').count()
-    total_revenue = Order.objects.filter(
-        payment_status="SUCCESS"
-    ).aggregate(Sum("total_amount"))["total_amount__sum"] or 0
+    kpis = catalog.dashboard_kpis()
     
     return render(request, "manager/dashboard.html", {
-        "total_products": total_products,
-        "low_stock_count": low_stock.count(),
-        "pending_orders": pending_orders,
-        "total_revenue": total_revenue,
+        "total_products": kpis["total_products"],
+        "low_stock_count": kpis["low_stock_count"],
+        "pending_orders": kpis["pending_orders"],
+        "total_revenue": kpis["total_revenue"],
     })
 
 
-@login_required
 @admin_required
+@read_replica
 def admin_dashboard(request):
-    total_revenue = Order.objects.filter(
-        payment_status="SUCCESS"
-    ).aggregate(Sum("total_amount"))["total_amount__sum"] or 0
+    kpis = catalog.dashboard_kpis()
 
     return render(request, "admin/dashboard.html", {
-        "total_users": User.objects.count(),
-        "total_revenue": total_revenue,
+        "total_users": kpis["total_users"],
+        "total_revenue": kpis["total_revenue"],
     })
 
 
 # ================= CUSTOMER VIEWS =================
 
-@login_required
 @customer_required
 def order_history(request):
-    """Display customer's order history"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, "customer/order_history.html", {"orders": orders})
+    """Display customer's order history, a page at a time"""
+    summary = order_summary(request.user)
+    orders = (
+        Order.objects.filter(user=request.user)
+        .order_by('-created_at')
+        .prefetch_related('items__product')
+    )
+    # The paginator counts the orders itself: the cached summary can lag
+    # behind orders changed outside checkout
+    paginator = Paginator(orders, ORDER_HISTORY_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, "customer/order_history.html", {
+        "orders": page.object_list,
+        "page": page,
+        "summary": summary,
+    })
 
 
-@login_required
 @customer_required
 def customer_profile(request):
     """Display and edit customer profile"""
@@ -317,7 +430,6 @@ def customer_profile(request):
 
 # ================= STAFF VIEWS =================
 
-@login_required
 @staff_required
 def stock_entry_view(request):
     """Staff stock entry view"""
@@ -353,10 +465,67 @@ def stock_entry_view(request):
     })
 
 
+@staff_required
+def performance_stats(request):
+    """Per-view timings aggregated by PerformanceMiddleware in this process"""
+    if request.method == "POST" and request.POST.get("action") == "reset":
+        perf.reset()
+    return JsonResponse({"views": perf.snapshot()})
+
+
 # ================= MANAGER VIEWS =================
 
-@login_required
+ORDER_PAGE_SIZE = 200
+
+
+@staff_required
+def staff_orders(request):
+    """
+    Order fulfilment: move the selected orders, or every order in the
+    current status, with one bulk action.
+    """
+    status = request.GET.get("status", "CONFIRMED")
+    if status not in TRANSITIONS:
+        status = "CONFIRMED"
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+        target = ORDER_ACTIONS.get(action)
+        if target is None:
+            messages.error(request, "Unknown action.")
+        else:
+            if request.POST.get("scope") == "all":
+                orders = Order.objects.filter(order_status=status)
+            else:
+                ids = [pk for pk in request.POST.getlist("order_ids") if pk.isdigit()]
+                orders = Order.objects.filter(pk__in=ids)
+            try:
+                moved = bulk_transition(orders, target, request.user, note=f"Bulk {action}")
+            except ConcurrentUpdate as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(request, f"{moved} orders moved to {target.lower()}.")
+        return redirect(f"{reverse('staff_orders')}?status={status}")
+
+    counts = dict(
+        Order.objects.order_by().values_list("order_status").annotate(Count("id"))
+    )
+    orders = (
+        Order.objects.filter(order_status=status)
+        .select_related("user")
+        .order_by("created_at")[:ORDER_PAGE_SIZE]
+    )
+    return render(request, "staff/orders.html", {
+        "status": status,
+        "statuses": [(value, label, counts.get(value, 0)) for value, label in Order.STATUS_CHOICES],
+        "orders": orders,
+        "total": counts.get(status, 0),
+        "actions": [name for name, target in ORDER_ACTIONS.items() if can_transition(status, target)],
+    })
+
+
 @manager_required
+@read_replica
 def manager_inventory(request):
     """Manager inventory management view"""
     products = Product.objects.all()
@@ -369,16 +538,102 @@ def manager_inventory(request):
     })
 
 
-@login_required
+@manager_required
+@read_replica
+def manager_valuation(request):
+    """Stock valuation grouped by category and supplier"""
+    return render(request, "manager/valuation.html", {
+        "report": inventory_valuation(),
+    })
+
+
+@manager_required
+@read_replica
+def manager_valuation_export(request):
+    """Export the stock valuation report as CSV"""
+    report = inventory_valuation()
+
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="inventory_valuation.csv"'
+
+    writer = csv.writer(response)
+    writer.writerow(["Category", "Supplier", "SKUs", "Units", "Stock Value"])
+    for row in report["by_category_supplier"]:
+        writer.writerow([
+            row["category__name"],
+            row["supplier"],
+            row["sku_count"],
+            row["units"],
+            row["stock_value"],
+        ])
+
+    totals = report["totals"]
+    writer.writerow(["TOTAL", "", totals["sku_count"], totals["units"], totals["stock_value"]])
+    return response
+
+
+@manager_required
+def manager_bulk_update(request):
+    """Bulk price/threshold/supplier changes from a CSV upload or a JSON body"""
+    if request.method == "POST" and request.content_type == "application/json":
+        try:
+            rows = json.loads(request.body).get("updates", [])
+        except (ValueError, AttributeError):
+            return JsonResponse({"error": "Expected a JSON object with an 'updates' list"}, status=400)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return JsonResponse({"error": "'updates' must be a list of objects"}, status=400)
+        result = apply_product_updates(rows)
+        return JsonResponse(result, status=400 if result["errors"] else 200)
+
+    form = ProductBulkUpdateForm(request.POST or None, request.FILES or None)
+    result = None
+
+    if request.method == "POST" and form.is_valid():
+        try:
+            rows = parse_csv(form.cleaned_data["csv_file"])
+        except (ValueError, UnicodeDecodeError) as exc:
+            messages.error(request, f"Could not read CSV: {exc}")
+        else:
+            result = apply_product_updates(rows)
+            if result["errors"]:
+                messages.error(request, "No changes applied; fix the errors below.")
+            else:
+                messages.success(request, f"Updated {result['updated']} products.")
+                return redirect("manager_bulk_update")
+
+    return render(request, "manager/bulk_update.html", {
+        "form": form,
+        "result": result,
+    })
+
+
 @manager_required
 def manager_approvals(request):
-    """Manager approvals view"""
-    return render(request, "manager/approvals.html", {})
+    """Approve (confirm) or reject (cancel) pending orders"""
+    if request.method == "POST":
+        order = get_object_or_404(Order, pk=request.POST.get("order_id"))
+        target = {"approve": "CONFIRMED", "reject": "CANCELLED"}.get(request.POST.get("action"))
+        if target is None:
+            messages.error(request, "Unknown action.")
+        else:
+            try:
+                transition(order, target, request.user, note="Manager approval")
+            except (InvalidTransition, ConcurrentUpdate) as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(request, f"Order {order.order_id} is now {target.lower()}.")
+        return redirect("manager_approvals")
+
+    pending_orders = (
+        Order.objects.filter(order_status="PENDING")
+        .select_related("user")
+        .prefetch_related("items__product")
+    )
+    return render(request, "manager/approvals.html", {"pending_orders": pending_orders})
 
 
 # ================= ADMIN VIEWS =================
 
-@login_required
 @admin_required
 def user_management(request):
     """Admin user management view"""
@@ -403,90 +658,254 @@ def user_management(request):
     return render(request, "admin/user_management.html", {"users": users})
 
 
-@login_required
 @admin_required
+@read_replica
 def inventory_dashboard(request):
     """Admin inventory dashboard"""
-    total_products = Product.objects.count()
+    kpis = catalog.dashboard_kpis()
     low_stock = Product.objects.filter(quantity__lte=F('low_stock_threshold'))
-    out_of_stock = Product.objects.filter(quantity=0)
     
     return render(request, "admin/inventory_dashboard.html", {
-        "total_products": total_products,
-        "low_stock_count": low_stock.count(),
-        "out_of_stock_count": out_of_stock.count(),
+        "total_products": kpis["total_products"],
+        "low_stock_count": kpis["low_stock_count"],
+        "out_of_stock_count": kpis["out_of_stock_count"],
         "low_stock": low_stock,
     })
 
 
-@login_required
 @admin_required
+@read_replica
 def purchase_reports(request):
     """Admin purchase reports view"""
     orders = Order.objects.all().order_by('-created_at')
-    total_orders = orders.count()
-    total_revenue = orders.filter(
-        payment_status="SUCCESS"
-    ).aggregate(Sum("total_amount"))["total_amount__sum"] or 0
+    kpis = catalog.dashboard_kpis()
     
     return render(request, "admin/purchase_reports.html", {
         "orders": orders,
-        "total_orders": total_orders,
-        "total_revenue": total_revenue,
+        "total_orders": kpis["total_orders"],
+        "total_revenue": kpis["total_revenue"],
     })
 
 
-@login_required
 @admin_required
+@read_replica
 def analytics_view(request):
     """Admin analytics view"""
-    total_users = User.objects.count()
-    total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    total_revenue = Order.objects.filter(
-        payment_status="SUCCESS"
-    ).aggregate(Sum("total_amount"))["total_amount__sum"] or 0
+    kpis = catalog.dashboard_kpis()
     
     return render(request, "admin/analytics.html", {
-        "total_users": total_users,
-        "total_products": total_products,
-        "total_orders": total_orders,
-        "total_revenue": total_revenue,
+        "total_users": kpis["total_users"],
+        "total_products": kpis["total_products"],
+        "total_orders": kpis["total_orders"],
+        "total_revenue": kpis["total_revenue"],
     })
 
 
+# ================= CATALOG API =================
+
+PRODUCT_API_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "sku": "sku",
+    "category": "category_id",
+    "category_name": "category__name",
+    "description": "description",
+    "price": "price",
+    "quantity": "quantity",
+    "supplier": "supplier",
+    "low_stock_threshold": "low_stock_threshold",
+    "image_url": "image_url",
+    "updated_at": "updated_at",
+}
+PRODUCT_API_DEFAULT_FIELDS = ["id", "name", "sku", "category", "price", "quantity"]
+
+STOCK_API_FIELDS = {
+    "id": "id",
+    "sku": "sku",
+    "quantity": "quantity",
+    "low_stock_threshold": "low_stock_threshold",
+}
+
+CATEGORY_API_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "description": "description",
+}
+
+
+def _stock_etag(request, *args, **kwargs):
+    return api_etag(request, STOCK, CATEGORY)
+
+
+def _category_etag(request):
+    return api_etag(request, CATEGORY)
+
+
+def _api_products(request):
+    products = Product.objects.all()
+
+    category_id = request.GET.get("category")
+    if category_id:
+        if not category_id.isdigit():
+            raise APIError("'category' must be an integer")
+        products = products.filter(category_id=category_id)
+
+    search = request.GET.get("search")
+    if search:
+        products = products.filter(Q(name__icontains=search) | Q(sku__iexact=search))
+
+    if request.GET.get("in_stock") == "1":
+        products = products.filter(quantity__gt=0)
+
+    return products
+
+
+@require_GET
+@condition(etag_func=_stock_etag)
+def api_products(request):
+    """Product listing: ?fields=, ?category=, ?search=, ?in_stock=1, ?after=, ?limit="""
+    try:
+        fields = parse_fields(request, PRODUCT_API_FIELDS, PRODUCT_API_DEFAULT_FIELDS)
+        results, next_url = keyset_page(request, _api_products(request), fields)
+    except APIError as exc:
+        return error_response(exc)
+    return JsonResponse({"results": results, "next": next_url})
+
+
+@require_GET
+@condition(etag_func=_stock_etag)
+def api_product_detail(request, pk):
+    try:
+        fields = parse_fields(request, PRODUCT_API_FIELDS, PRODUCT_API_FIELDS)
+    except APIError as exc:
+        return error_response(exc)
+    row = Product.objects.filter(pk=pk).values(*fields.values()).first()
+    if row is None:
+        return JsonResponse({"error": "Not found"}, status=404)
+    return JsonResponse({name: row[lookup] for name, lookup in fields.items()})
+
+
+@require_GET
+@condition(etag_func=_category_etag)
+def api_categories(request):
+    try:
+        fields = parse_fields(request, CATEGORY_API_FIELDS, CATEGORY_API_FIELDS)
+        results, next_url = keyset_page(request, Category.objects.all(), fields)
+    except APIError as exc:
+        return error_response(exc)
+    return JsonResponse({"results": results, "next": next_url})
+
+
+@require_GET
+@condition(etag_func=_stock_etag)
+def api_stock(request):
+    """Stock levels, optionally for ?ids=1,2,3 or only ?low=1 items"""
+    products = Product.objects.all()
+    try:
+        ids = request.GET.get("ids")
+        if ids:
+            try:
+                products = products.filter(pk__in=[int(i) for i in ids.split(",") if i])
+            except ValueError:
+                raise APIError("'ids' must be a comma-separated list of integers")
+        if request.GET.get("low") == "1":
+            products = products.filter(quantity__lte=F("low_stock_threshold"))
+        fields = parse_fields(request, STOCK_API_FIELDS, STOCK_API_FIELDS)
+        results, next_url = keyset_page(request, products, fields)
+    except APIError as exc:
+        return error_response(exc)
+    return JsonResponse({"results": results, "next": next_url})
+
+
 # ================= CHATBOT =================
 
+def _chatbot_wants_categories(message):
+    return "category" in message
+
+
+def _chatbot_reply(message, category_names=()):
+    """Build the chatbot answer; category names are fetched by the caller"""
+    if _chatbot_wants_categories(message):
+        response = "Available Categories:\n"
+        for name in category_names:
+            response += f"- {name}\n"
+        return response
+
+    if "price" in message:
+        return "Please mention the product name to check price."
+
+    if "stock" in message:
+        return "Tell me the product name to check stock."
+
+    return "I'm your Supermart assistant. Ask me about products, prices, or categories!"
+
+
 @csrf_exempt
 def chatbot_api(request):
     if request.method == "POST":
         data = json.loads(request.body)
         message = data.get("message", "").lower()
 
-        response = "I'm your Supermart assistant. Ask me about products, prices, or categories!"
-
-        if "category" in message:
-            categories = Category.objects.all()
-            response = "Available Categories:\n"
-            for cat in categories:
-                response += f"- {cat.name}\n"
+        category_names = []
+        if _chatbot_wants_categories(message):
+            category_names = Category.objects.values_list("name", flat=True)
 
-        elif "price" in message:
-            response = "Please mention the product name to check price."
+        return JsonResponse({"response": _chatbot_reply(message, category_names)})
 
-        elif "stock" in message:
-            response = "Tell me the product name to check stock."
+    return JsonResponse({"error": "Invalid request"}, status=400)
 
-        return JsonResponse({"response": response})
+def _payment_data(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body)
+        except ValueError:
+            raise PaymentError("Invalid JSON")
+    return request.POST
 
-    return JsonResponse({"error": "Invalid request"}, status=400)
 
 @csrf_exempt
+@require_POST
 def payment_callback(request):
-    return JsonResponse({"status": "success", "message": "Payment callback received."})
+    """
+    Checkout handler callback: verify the signature and queue the payment.
+
+    Orders are updated by the payments.process job. Browsers posting the
+    checkout form are redirected; JSON callers get a JSON status.
+    """
+    wants_json = request.content_type == "application/json"
+    try:
+        event = verify_callback(_payment_data(request))
+    except PaymentError as exc:
+        if wants_json:
+            return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+        return redirect("payment_failure")
+
+    ingest([event])
+    if wants_json:
+        return JsonResponse({"status": "success", "message": "Payment callback received."})
+    order = Order.objects.filter(razorpay_order_id=event.razorpay_order_id).only("order_id").first()
+    if order is None:
+        return redirect("payment_failure")
+    return redirect("payment_success", order_id=order.order_id)
+
 
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    """Razorpay webhook: verify, append to the inbox and acknowledge"""
+    try:
+        events = verify_webhook(request.body, request.headers.get("X-Razorpay-Signature", ""))
+    except PaymentError as exc:
+        return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+    ingest(events)
+    return JsonResponse({"status": "success", "received": len(events)})
+
+
+@login_required
 def payment_success(request, order_id):
-    return render(request, "payment_success.html", {"order_id": order_id})
+    # Payment status may still read PENDING until payments.process has run
+    order = get_object_or_404(Order, order_id=order_id, user=request.user)
+    return render(request, "payment_success.html", {"order": order, "order_id": order_id})
 
 def payment_failure(request):
     return render(request, "payment_failure.html")
@@ -9,3 +9,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supermart_project.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.TEMPLATE_PRECOMPILE:
+    from core.utils.templates import precompile_templates
+    precompile_templates()
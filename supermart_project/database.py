@@ -0,0 +1,149 @@
+"""
+Database configuration built from environment variables
+
+Kept out of settings.py so the connection options for each backend live
+in one place; settings.py only calls database_settings().
+"""
+import os
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)) == 'True'
+
+
+def _conn_max_age():
+    # 'None' keeps connections open for the life of the worker
+    value = os.getenv('DB_CONN_MAX_AGE', '60')
+    return None if value == 'None' else int(value)
+
+
+# Setting these writes to the database file, which a read-only
+# (mode=ro) replica connection refuses
+WRITE_PRAGMAS = {'journal_mode'}
+
+
+def sqlite_pragmas():
+    """PRAGMAs applied to every new SQLite connection, in order"""
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative values are KiB rather than pages
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-64000')),
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+
+
+def _mysql(conn_max_age, health_checks):
+    database = {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': os.getenv('DB_NAME', 'tyrant'),
+        'USER': os.getenv('DB_USER', 'root'),
+        'PASSWORD': os.getenv('DB_PASSWORD', 'tyler'),
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '3306'),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': health_checks,
+        'OPTIONS': {
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            'charset': 'utf8mb4',
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+        },
+    }
+
+    # DB_POOL needs django-db-connection-pool; without it we fall back to
+    # Django's persistent connections
+    if _env_bool('DB_POOL', False):
+        try:
+            import dj_db_conn_pool  # noqa: F401
+        except ImportError:
+            return database
+        database['ENGINE'] = 'dj_db_conn_pool.backends.mysql'
+        # The pool owns connection lifetime; Django hands connections back after each request
+        database['CONN_MAX_AGE'] = 0
+        database['POOL_OPTIONS'] = {
+            'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', '10')),
+            'MAX_OVERFLOW': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+            'RECYCLE': int(os.getenv('DB_POOL_RECYCLE', '3600')),
+            'PRE_PING': health_checks,
+        }
+    return database
+
+
+def _sqlite(base_dir, conn_max_age, health_checks):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_NAME', base_dir / 'db.sqlite3'),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': health_checks,
+        'OPTIONS': {
+            # Seconds a writer waits on a locked database before raising
+            'timeout': int(os.getenv('DB_TIMEOUT', '20')),
+        },
+    }
+
+
+def _replica(default):
+    """
+    The 'replica' alias, or None when there is none.
+
+    SQLite reads the primary file through a separate read-only connection
+    (WAL lets it read while checkout writes), or DB_REPLICA_NAME if set.
+    MySQL needs DB_REPLICA_HOST; the other credentials default to the
+    primary's.
+    """
+    if not _env_bool('DB_REPLICA', True):
+        return None
+    replica = dict(default, OPTIONS=dict(default['OPTIONS']))
+    if default['ENGINE'] == 'django.db.backends.sqlite3':
+        name = os.getenv('DB_REPLICA_NAME', default['NAME'])
+        replica['NAME'] = f'file:{name}?mode=ro'
+    else:
+        host = os.getenv('DB_REPLICA_HOST')
+        if not host:
+            return None
+        replica['HOST'] = host
+        replica['PORT'] = os.getenv('DB_REPLICA_PORT', default['PORT'])
+        replica['USER'] = os.getenv('DB_REPLICA_USER', default['USER'])
+        replica['PASSWORD'] = os.getenv('DB_REPLICA_PASSWORD', default['PASSWORD'])
+    # Tests run against the primary's test database
+    replica['TEST'] = {'MIRROR': 'default'}
+    return replica
+
+
+def database_settings(base_dir):
+    """
+    Return the DATABASES setting.
+
+    USE_MYSQL=True selects MySQL (PyMySQL), otherwise SQLite. DB_CONN_MAX_AGE
+    (default 60s) and DB_CONN_HEALTH_CHECKS (default True) apply to both.
+    Persistent connections only help WSGI workers; under ASGI Django opens
+    a connection per request thread regardless. A 'replica' alias is added
+    for reporting reads (see core.routers).
+    """
+    conn_max_age = _conn_max_age()
+    health_checks = _env_bool('DB_CONN_HEALTH_CHECKS', True)
+    if _env_bool('USE_MYSQL', False):
+        default = _mysql(conn_max_age, health_checks)
+    else:
+        default = _sqlite(base_dir, conn_max_age, health_checks)
+
+    databases = {'default': default}
+    replica = _replica(default)
+    if replica is not None:
+        databases['replica'] = replica
+    return databases
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver that tunes new SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    from django.conf import settings
+
+    read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+    # Run on the raw connection so the query timers don't count them
+    for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if read_only and pragma in WRITE_PRAGMAS:
+            continue
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
@@ -11,6 +11,8 @@ from dotenv import load_dotenv
 import pymysql
 pymysql.install_as_MySQLdb()
 
+from .database import database_settings, sqlite_pragmas
+
 # Load environment variables
 load_dotenv()
 
@@ -38,8 +40,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.LazySessionRefreshMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -53,8 +59,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per process; the dev server's
+            # autoreloader resets them when a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -65,37 +77,98 @@ TEMPLATES = [
     },
 ]
 
+# Compile every template when a WSGI/ASGI worker boots
+TEMPLATE_PRECOMPILE = os.getenv('TEMPLATE_PRECOMPILE', str(not DEBUG)) == 'True'
+
 WSGI_APPLICATION = 'supermart_project.wsgi.application'
+ASGI_APPLICATION = 'supermart_project.asgi.application'
+
+# Route products_list, product_detail and chatbot_api to their async
+# versions (core/async_views.py); enable when serving through ASGI
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
 
 # Database - Dynamic Configuration
-if os.getenv('USE_MYSQL', 'False') == 'True':
-    # MySQL Configuration (when available)
-    DATABASES = {
+# USE_MYSQL selects MySQL over SQLite; connection lifetime, health checks and
+# the optional MySQL pool are read from DB_* variables (see database.py)
+DATABASES = database_settings(BASE_DIR)
+SQLITE_PRAGMAS = sqlite_pragmas()
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Seconds a client's reporting reads stay on the primary after it writes
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+
+# Cache - Dynamic Configuration
+# CACHE_BACKEND: locmem (per process), file, sqlite (shared across worker
+# processes on one host) or redis (falls back to sqlite if redis-py is missing)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '300'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+
+if CACHE_BACKEND == 'redis':
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        CACHE_BACKEND = 'sqlite'
+        CACHE_LOCATION = ''
+
+# Whether every worker process sees the same cache, so generation counters
+# kept in it can stand in for database checks
+CACHE_SHARED = CACHE_BACKEND in ('redis', 'sqlite')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
         'default': {
-            'ENGINE': 'django.db.backends.mysql',
-            'NAME': 'tyrant',
-            'USER': 'root',
-            'PASSWORD': 'tyler',
-            'HOST': 'localhost',
-            'PORT': '3306',
-            'OPTIONS': {
-                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-                'charset': 'utf8mb4',
-            },
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+            'TIMEOUT': CACHE_TIMEOUT,
+        }
+    }
+elif CACHE_BACKEND == 'sqlite':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': CACHE_LOCATION or os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION or os.path.join(BASE_DIR, 'cache', 'files'),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
         }
     }
 else:
-    # SQLite Configuration (default for development)
-    DATABASES = {
+    CACHES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': CACHE_LOCATION or 'supermart',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
         }
     }
 
+# Seconds anonymous visitors and proxies may reuse a catalog page before revalidating
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', '0'))
+
+# Full-page cache for anonymous catalog traffic (home, products, product detail).
+# Pages are keyed by the stock and category generations, so it is only used
+# with a shared cache; per-process caches would keep serving stale pages.
+PAGE_CACHE_ENABLED = CACHE_SHARED and os.getenv('PAGE_CACHE_ENABLED', 'True') == 'True'
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+
 # Custom User Model
 AUTH_USER_MODEL = 'core.User'
 
+# The login form authenticates by email; the admin site still uses usernames
+AUTHENTICATION_BACKENDS = [
+    'core.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -137,10 +210,36 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Email (order confirmations and stock alerts are sent by the run_jobs worker)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'orders@supermart.com')
+
 # Razorpay Configuration
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', '')
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+# PAYMENT_GATEWAY: razorpay, or local for the in-process stand-in
+PAYMENT_GATEWAY = os.getenv('PAYMENT_GATEWAY', 'razorpay')
 
 # Session settings
+# SESSION_BACKEND: cached_db, db or signed_cookies. cached_db is the default
+# only with a shared cache; on a per-process cache it falls back to db, since
+# a session changed through one worker would stay stale in the others.
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db' if CACHE_SHARED else 'db')
+if SESSION_BACKEND == 'cached_db' and not CACHE_SHARED:
+    SESSION_BACKEND = 'db'
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are not saved on every request; LazySessionRefreshMiddleware
+# extends expiry once less than this fraction of SESSION_COOKIE_AGE remains
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_THRESHOLD = float(os.getenv('SESSION_REFRESH_THRESHOLD', '0.5'))
+
+# Stored carts nobody has changed for this many days are swept away
+CART_IDLE_DAYS = int(os.getenv('CART_IDLE_DAYS', '30'))
+
+# Slow query log (a negative threshold disables it)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', os.path.join(BASE_DIR, 'logs', 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUP_COUNT = int(os.getenv('SLOW_QUERY_LOG_BACKUP_COUNT', '5'))